@@ -12,6 +12,8 @@ from matplotlib import colors
 from PIL import Image
 from scipy import stats
 
+from plv import catalog, cube, derived, dtypes, index, memo, prefix, ranks, scan, shared
+
 logo_loc = 'https://github.com/Blandalytics/PLV_viz/blob/main/data/PL-text-wht.png?raw=true'
 logo = Image.open(urllib.request.urlopen(logo_loc))
 st.image(logo, width=200)
@@ -70,68 +72,53 @@ season_names = {
 }
 
 # Load Data
-@st.cache_data(ttl=2*3600,show_spinner=f"Loading {year} data")
 def load_season_data(year):
-    df = pd.DataFrame()
-    for month in range(3,11):
-        file_name = f'https://github.com/Blandalytics/PLV_viz/blob/main/data/{year}_PLV_App_Data-{month}.parquet?raw=true'
-        df = pd.concat([df,
-                        pd.read_parquet(file_name)[['hittername','p_hand','b_hand','pitch_id','balls','strikes','swing_agg',
-                                                    'strike_zone_judgement','decision_value','contact_over_expected',
-                                                    'adj_power','batter_wOBA','pitchtype','pitch_type_bucket',
-                                                    'in_play_input','p_x','p_z','sz_z','strike_zone_top','strike_zone_bottom'
-                                                   ]]
-                       ])
-    
-    df = df.reset_index(drop=True)
-
-    df.loc[df['p_x'].notna(),'kde_x'] = np.clip(df.loc[df['p_x'].notna(),'p_x'].astype('float').mul(12).round(0).astype('int').div(12),
-                                                -20/12,
-                                                20/12)
-    df.loc[df['sz_z'].notna(),'kde_z'] = np.clip(df.loc[df['sz_z'].notna(),'sz_z'].astype('float').mul(24).round(0).astype('int').div(24),
-                                                 -1.5,
-                                                 1.25)
-    
-    df['base_decision_value'] = df['decision_value'].groupby([df['p_hand'],
-                                                              df['b_hand'],
-                                                              df['pitchtype'],
-                                                              df['kde_x'],
-                                                              df['kde_z'],
-                                                              df['balls'],
-                                                              df['strikes']]).transform('mean')
-    df['base_power'] = df['adj_power'].groupby([df['p_hand'],
-                                                df['b_hand'],
-                                                df['pitchtype'],
-                                                df['kde_x'],
-                                                df['kde_z'],
-                                                df['balls'],
-                                                df['strikes']]).transform('mean')
-
-    df['sa_oa'] = df['swing_agg'].copy()
-    df['dv_oa'] = df['decision_value'].sub(df['base_decision_value'])
-    df['ca_oa'] = df['contact_over_expected'].copy()
-    df['pow_oa'] = df['adj_power'].sub(df['base_power'])
+    df = scan.scan_season(year,
+                          columns=['hittername','p_hand','b_hand','pitch_id','balls','strikes','swing_agg',
+                                   'strike_zone_judgement','decision_value','contact_over_expected',
+                                   'adj_power','batter_wOBA','pitchtype','pitch_type_bucket',
+                                   'in_play_input','p_x','p_z','sz_z','strike_zone_top','strike_zone_bottom',
+                                   'game_played'
+                                  ])
 
-    
-    df.loc[df['sz_z'].notna(),'kde_z'] = np.clip(df.loc[df['sz_z'].notna(),'p_z'].astype('float').mul(12).round(0).astype('int').div(12),
-                                                 0,
-                                                 4.5)
+    # Keep each hitter's pitches together, in pitch order
+    df = df.sort_values(['hittername','pitch_id'], ignore_index=True)
 
-    for stat in ['swing_agg','strike_zone_judgement','contact_over_expected','in_play_input']:
-        df[stat] = df[stat].mul(100).astype('float')
-    
-    # Convert to runs added
-    df['decision_value'] = df['decision_value'].div(seasonal_constants.loc[year]['run_constant']).mul(100)
-    df['batter_wOBA'] = df['batter_wOBA'].div(seasonal_constants.loc[year]['run_constant']).mul(100)
-    
-    df['count'] = df['balls'].astype('str')+'-'+df['strikes'].astype('str')
-    
-    return df
+    # Location bins, baselines, over-expected values and run conversions
+    df = derived.with_derived(df, year, run_constant=seasonal_constants.loc[year]['run_constant'])
+
+    return dtypes.apply_plan(df)
+
+@st.cache_resource(ttl=2*3600)
+def season_catalog():
+    return catalog.SeasonCatalog(load_season_data)
+
+with st.spinner(f"Loading {year} data"):
+    plv_df = shared.view(season_catalog()[year])
+
+@st.cache_resource(ttl=2*3600)
+def player_index(year):
+    return index.PlayerIndex(season_catalog()[year], 'hittername')
+
+@st.cache_resource(ttl=2*3600)
+def filter_index(year):
+    return index.BitmapIndex(season_catalog()[year], ['count','pitch_type_bucket','p_hand','b_hand'])
+
+@st.cache_resource(ttl=2*3600)
+def hitter_cube(year):
+    return cube.Cube(season_catalog()[year], cube.HITTER_KEYS, cube.HITTER_MEASURES)
+
+@st.cache_resource(ttl=2*3600)
+def hitter_dates(year):
+    return prefix.DatePrefix(season_catalog()[year], 'hittername', 'game_played', cube.HITTER_MEASURES)
 
-plv_df = load_season_data(year)
+@st.cache_resource(ttl=2*3600)
+def selection_memo():
+    return memo.LRUMemo()
 
-max_pitches = plv_df.groupby('hittername')['pitch_id'].count().max()
-start_val = int(plv_df.groupby('hittername')['pitch_id'].count().quantile(0.4)/50)*50
+hitter_pitches = hitter_cube(year).rollup(['hittername'])['n']
+max_pitches = hitter_pitches.max()
+start_val = int(hitter_pitches.quantile(0.4)/50)*50
 
 # Num Pitches threshold
 pitch_thresh = st.number_input(f'Min # of Pitches faced:',
@@ -140,22 +127,23 @@ pitch_thresh = st.number_input(f'Min # of Pitches faced:',
                                step=50, 
                                value=500)
 
-season_df = (plv_df
+# Game dates
+season_start, season_end = hitter_dates(year).dates
+range_start, range_end = st.slider('Game dates:',
+                                   min_value=season_start.date(),
+                                   max_value=season_end.date(),
+                                   value=(season_start.date(), season_end.date()),
+                                   format='MMM D')
+
+season_df = (hitter_dates(year)
+             .stats(range_start, range_end)
+             .reset_index()
+             .astype({'hittername':'str'})
              .rename(columns=season_names)
              .rename(columns={'hittername':'Name',
-                              'pitch_id':'Pitches'})
-             .astype({'Name':'str'})
-             .groupby('Name')
+                              'n':'Pitches'})
+             .set_index('Name')
              [['Pitches']+list(season_names.values())]
-             .agg({
-                 'Pitches':'count',
-                 'Swing Agg (%)':'mean',
-                 'SZ Judge':'mean',
-                 'Dec Value':'mean',
-                 'Contact':'mean',
-                 'Power':'mean',
-                 'HP':'mean'
-             })
              .query(f'Pitches >= {pitch_thresh}')
              .sort_values('HP', ascending=False)
             )
@@ -200,11 +188,10 @@ plv_df = plv_df.rename(columns=stat_names)
 st.title("Rolling Ability Charts")
 
 # Player
-players = list(plv_df.groupby('hittername', as_index=False)[['pitch_id','Hitter Performance']].agg({
-    'pitch_id':'count',
-    'Hitter Performance':'mean'}).query(f'pitch_id >={pitch_thresh}').sort_values('Hitter Performance', ascending=False)['hittername'])
+players = list(hitter_cube(year).stats(['hittername'], measures=['batter_wOBA']).query(f'n >={pitch_thresh}').sort_values('batter_wOBA', ascending=False).index)
 default_player = players.index('Juan Soto')
 player = st.selectbox('Choose a hitter:', players, index=default_player)
+player_df = player_index(year).select(plv_df, player)
 
 col1, col2 = st.columns([0.5,0.5])
 
@@ -285,7 +272,7 @@ handedness = st.select_slider(
 if handedness=='All':
     hitter_hand = ['L','R']
 else:
-    hitter_hand = list(plv_df.loc[(plv_df['hittername']==player),'b_hand'].unique())
+    hitter_hand = list(player_df['b_hand'].unique())
 
 hand_map = {
     'Left':['L'],
@@ -293,40 +280,52 @@ hand_map = {
     'Right':['R']
 }
 
-chart_thresh_list = (plv_df
-                     .loc[plv_df['count'].astype('str').isin(selected_options) &
-                          plv_df['pitch_type_bucket'].isin(pitchtype_select) &
-                          plv_df['b_hand'].isin(hitter_hand) &
-                          plv_df['p_hand'].isin(hand_map[handedness])
-                         ]
-                     .groupby('hittername')
-                     [['pitch_id',metric]]
-                     .agg({
-                         'pitch_id':'count',
-                         metric:'mean'
-                     })
-                     .query(f'pitch_id >= {updated_threshold}')
-                     .copy()
-                    )
-
-chart_mean = plv_df.loc[plv_df['count'].isin(selected_options) & plv_df['pitch_type_bucket'].isin(pitchtype_select),metric].mean()
-chart_90 = chart_thresh_list[metric].quantile(0.9)
-chart_75 = chart_thresh_list[metric].quantile(0.75)
-chart_25 = chart_thresh_list[metric].quantile(0.25)
-chart_10 = chart_thresh_list[metric].quantile(0.1)
-
-plv_df[metric] = plv_df[metric].replace([np.inf, -np.inf], np.nan)
-rolling_df = (plv_df
-              .sort_values('pitch_id')
-              .loc[(plv_df['hittername']==player) &
-                   plv_df['p_hand'].isin(hand_map[handedness]) &
-                   plv_df['count'].isin(selected_options) &
-                   plv_df['pitch_type_bucket'].isin(pitchtype_select),
-                   ['hittername',metric]]
-              .dropna()
-              .reset_index(drop=True)
-              .reset_index()
-             )
+metric_cols = {name: stat for stat, name in stat_names.items()}
+
+@selection_memo()
+def get_chart_thresh_list(year,metric,selected_options,pitchtype_select,hitter_hand,p_hand,updated_threshold):
+    return (hitter_cube(year)
+            .stats(['hittername'],
+                   {'count':selected_options,
+                    'pitch_type_bucket':pitchtype_select,
+                    'b_hand':hitter_hand,
+                    'p_hand':p_hand},
+                   [metric_cols[metric]])
+            .rename(columns={metric_cols[metric]:metric})
+            .query(f'n >= {updated_threshold}')
+           )
+
+@selection_memo()
+def get_chart_mean(year,metric,selected_options,pitchtype_select):
+    return hitter_cube(year).stats(filters={'count':selected_options,'pitch_type_bucket':pitchtype_select},
+                                   measures=[metric_cols[metric]])[metric_cols[metric]].iloc[0]
+
+@selection_memo()
+def get_rolling_df(year,player,metric,p_hand,selected_options,pitchtype_select):
+    return (player_df
+            .loc[filter_index(year).mask({'p_hand':p_hand,
+                                          'count':selected_options,
+                                          'pitch_type_bucket':pitchtype_select},
+                                         rows=player_index(year).rows(player)),
+                 ['hittername',metric]]
+            .replace([np.inf, -np.inf], np.nan)
+            .dropna()
+            .reset_index(drop=True)
+            .reset_index()
+           )
+
+@selection_memo()
+def get_rolling_stat(year,player,metric,p_hand,selected_options,pitchtype_select,window):
+    values = get_rolling_df(year,player,metric,p_hand,selected_options,pitchtype_select)[metric]
+    rolling_stat = values.rolling(window).mean()
+    fixed_window = window if (values.mean() < rolling_stat.max()) and (values.mean() > rolling_stat.min()) else int(window*2/3)
+    return values.rolling(window, min_periods=fixed_window).mean(), fixed_window
+
+chart_thresh_list = get_chart_thresh_list(year,metric,selected_options,pitchtype_select,hitter_hand,hand_map[handedness],updated_threshold)
+chart_mean = get_chart_mean(year,metric,selected_options,pitchtype_select)
+chart_10, chart_25, chart_75, chart_90 = ranks.PercentileTable(chart_thresh_list[metric]).quantile([0.1,0.25,0.75,0.9])
+
+rolling_df = shared.view(get_rolling_df(year,player,metric,hand_map[handedness],selected_options,pitchtype_select))
 
 window_max = max(rolling_threshold[metric],int(round(rolling_df.shape[0]/10)*7))
 
@@ -337,9 +336,7 @@ window = st.number_input(f'Choose a {rolling_denom[metric]} threshold:',
                          step=5, 
                          value=rolling_threshold[metric])
 
-rolling_df['Rolling_Stat'] = rolling_df[metric].rolling(window).mean()
-fixed_window = window if (rolling_df[metric].mean() < rolling_df['Rolling_Stat'].max()) and (rolling_df[metric].mean() > rolling_df['Rolling_Stat'].min()) else int(window*2/3)
-rolling_df['Rolling_Stat'] = rolling_df[metric].rolling(window, min_periods=fixed_window).mean()
+rolling_df['Rolling_Stat'], fixed_window = get_rolling_stat(year,player,metric,hand_map[handedness],selected_options,pitchtype_select,window)
 
 color_norm = colors.TwoSlopeNorm(vmin=chart_10, 
                                  vcenter=chart_mean,
@@ -11,6 +11,8 @@ from PIL import Image
 from collections import Counter
 from scipy import stats
 
+from plv import catalog, cube, dtypes, index, pla, prefix, ranks, scan, shared
+
 ## Set Styling
 # Plot Style
 pl_white = '#FEFEFE'
@@ -87,40 +89,53 @@ year = st.radio('Choose a year:', years)
 seasonal_constants = pd.read_csv('https://github.com/Blandalytics/PLV_viz/blob/main/data/plv_seasonal_constants.csv?raw=true').set_index('year')
 
 # Load Data
-@st.cache_data
 def load_data(year):
-    df = pd.DataFrame()
-    for month in range(3,11):
-        file_name = f'https://github.com/Blandalytics/PLV_viz/blob/main/data/{year}_PLV_App_Data-{month}.parquet?raw=true'
-        df = pd.concat([df,
-                        pd.read_parquet(file_name)[['pitchername','pitcher_mlb_id','pitch_id',
-                                                    'p_hand','b_hand','pitchtype','PLV','velo',
-                                                    'IHB','IVB'
-                                                   ]]
-                       ])
+    df = scan.scan_season(year,
+                          columns=['pitchername','pitcher_mlb_id','pitch_id',
+                                   'p_hand','b_hand','pitchtype','PLV','velo',
+                                   'IHB','IVB','game_played'
+                                  ],
+                          filters=[('pitchtype','not in',scan.NON_PITCHES)])
     df = (df
-          .sort_values('pitch_id')
+          .sort_values(['pitchername','pitch_id'])
           .astype({'pitch_id':'int',
                    'pitcher_mlb_id':'int'})
-          .query(f'pitchtype not in {["KN","SC","UN"]}')
           .reset_index(drop=True)
          )
+    df['month'] = df['game_played'].dt.month
     
     df['pitch_runs'] = df['PLV'].mul(seasonal_constants.loc[year]['run_plv_coef']).add(seasonal_constants.loc[year]['run_plv_constant'])
     
-    df['pitch_quality'] = 'Average'
-    df.loc[df['PLV']>=5.5,'pitch_quality'] = 'Quality'
-    df.loc[df['PLV']<4.5,'pitch_quality'] = 'Bad'
+    return dtypes.apply_plan(df)
 
-    for qual in df['pitch_quality'].unique():
-      df[qual+' Pitch'] = 0
-      df.loc[df['pitch_quality']==qual,qual+' Pitch'] = 1
+@st.cache_resource
+def season_catalog():
+    return catalog.SeasonCatalog(load_data)
 
-    df['QP-BP'] = df['Quality Pitch'].sub(df['Bad Pitch'])
-    
-    return df
-plv_df = load_data(year)
-default_count = int(min(500,round(plv_df.groupby('pitchername')['pitch_id'].count().max()/2,-2)/2))
+with st.spinner(f"Loading {year} data"):
+    plv_df = shared.view(season_catalog()[year])
+
+@st.cache_resource
+def player_index(year):
+    return index.PlayerIndex(season_catalog()[year], 'pitchername')
+
+@st.cache_resource
+def pitcher_cube(year):
+    return cube.Cube(season_catalog()[year], cube.PITCHER_KEYS, cube.PITCHER_MEASURES)
+
+@st.cache_resource
+def plv_histogram(year):
+    return cube.Histogram(season_catalog()[year], ['pitchername','pitchtype','p_hand','b_hand'], 'PLV')
+
+@st.cache_resource
+def plv_cumulative(year):
+    return cube.CumulativeHistogram(season_catalog()[year], 'pitchername', 'PLV')
+
+@st.cache_resource
+def pitcher_dates(year):
+    return prefix.DatePrefix(season_catalog()[year], 'pitchername', 'game_played', ['PLV','pitch_runs'])
+
+default_count = int(min(500,round(pitcher_cube(year).rollup(['pitchername'])['n'].max()/2,-2)/2))
 
 def get_ids():
     id_df = pd.DataFrame()
@@ -143,37 +158,30 @@ pitch_threshold = st.number_input(f'Min # of Pitches:',
                                   step=50, 
                                   value=default_count)
 
+@st.cache_resource
+def load_pla():
+    return pla.load()
+
+@st.cache_resource
+def pla_rollup(year,p_hand=['L','R'],b_hand=['L','R']):
+    return pla.rollup(load_pla(),year,p_hand,b_hand)
+
+@st.cache_resource
+def plv_ranks(year,p_hand,b_hand,pitch_threshold):
+    rank_df = pla.season_stats(pla_rollup(year,p_hand,b_hand), pitch_threshold/20)
+    return {'':ranks.PercentileTable(rank_df.query(f'season_pitches >= {pitch_threshold}')['PLV']),
+            **ranks.tables(rank_df.query(f'num_pitches >= {int(pitch_threshold/20)}'), 'pitchtype_plv', 'pitchtype')}
+
+plv_quantiles = [1, 0.95, 0.9, 0.75, 0.5, 0.25, 0.1, 0.05, 0]
+
+@st.cache_resource
+def plv_curves(year,p_hand,b_hand,pitch_threshold):
+    return {pitchtype:(*ranks.kde_curve(table.values), table.quantile(plv_quantiles))
+            for pitchtype, table in plv_ranks(year,p_hand,b_hand,pitch_threshold).items()}
+
 def get_pla(year,pitch_threshold=pitch_threshold,p_hand=['L','R'],b_hand=['L','R']):
-    pla_data = pd.read_csv('https://github.com/Blandalytics/PLV_viz/blob/main/data/pla_data.csv?raw=true', encoding='latin1')
-    season_df = (pla_data
-             .loc[(pla_data['year_played']==year) &
-                  pla_data['p_hand'].isin(p_hand) &
-                  pla_data['b_hand'].isin(b_hand)]
-             .assign(total_plv = lambda x: x['num_pitches'] * x['plv'])
-      .groupby(['pitchername','pitchtype','pitcher_mlb_id'])
-      [['num_pitches','pitch_runs','total_plv','subset_ip']]
-      .agg({
-          'num_pitches':'sum',
-          'subset_ip':'sum',
-          'pitch_runs':'sum',
-          'total_plv':'sum'
-      })
-      .sort_values('pitch_runs', ascending=False)
-      .query(f'num_pitches >={int(pitch_threshold/20)}') # 5% of total pitches threshold
-      .reset_index()
-      )
-
-    # Clean IP to actual fractions
-    season_df['season_IP'] = season_df['subset_ip'].groupby(season_df['pitcher_mlb_id']).transform('sum')
-    season_df['season_pitches'] = season_df['num_pitches'].groupby(season_df['pitcher_mlb_id']).transform('sum')
-
-    # Calculate PLV, in general, and per-pitchtype
-    season_df['PLV'] = season_df['total_plv'].groupby(season_df['pitcher_mlb_id']).transform('sum').div(season_df['season_pitches']).astype('float')
-    season_df['pitchtype_plv'] = season_df['total_plv'].div(season_df['num_pitches'])
-
-    # Calculate PLA, in general, and per-pitchtype
-    season_df['PLA'] = season_df['pitch_runs'].groupby(season_df['pitcher_mlb_id']).transform('sum').mul(9).div(season_df['season_IP']).astype('float')
-    season_df['pitchtype_pla'] = season_df['pitch_runs'].mul(9).div(season_df['subset_ip']) # ERA Scale
+    season_df = pla.season_stats(pla_rollup(year,p_hand,b_hand),
+                                 int(pitch_threshold/20)) # 5% of total pitches threshold
 
     season_df = season_df.sort_values('PLA')
 
@@ -225,6 +233,40 @@ st.dataframe(pla_df
              .map(lambda x: 'color: transparent; background-color: transparent' if x==fill_val else '')
             )
 
+st.title("Date Range Stats")
+season_start, season_end = pitcher_dates(year).dates
+col1, col2 = st.columns([0.7,0.3])
+with col1:
+    range_start, range_end = st.slider('Game dates:',
+                                       min_value=season_start.date(),
+                                       max_value=season_end.date(),
+                                       value=(season_start.date(), season_end.date()),
+                                       format='MMM D')
+with col2:
+    range_threshold = st.number_input('Min # of Pitches in range:',
+                                      min_value=0,
+                                      max_value=2000,
+                                      step=25,
+                                      value=100)
+
+range_totals = pitcher_dates(year).totals(range_start, range_end)
+range_df = (pd.DataFrame({'# Pitches':range_totals['n'].astype('int'),
+                          'PLV':range_totals['PLV'].div(range_totals['PLV_n']),
+                          'Pitch Runs':range_totals['pitch_runs']})
+            .query(f'`# Pitches` >= {max(range_threshold,1)}')
+            .rename_axis('Pitcher')
+            .sort_values('PLV', ascending=False)
+            .reset_index()
+            .astype({'Pitcher':'str'})
+           )
+
+st.write(f'{range_start:%b} {range_start.day} to {range_end:%b} {range_end.day}. Pitch Runs are the total predicted run value of the pitches. Table is sortable.')
+st.dataframe(range_df
+             .style
+             .format(precision=2, thousands=',')
+             .background_gradient(axis=0, vmin=4, vmax=6, cmap=f"{diverging_palette}", subset=['PLV'])
+            )
+
 st.title("Pitcher Charts")
 
 palettes = ['Pitcher List','Color Blind-Friendly']
@@ -243,6 +285,7 @@ players = list(pla_df
               )
 default_ix = players.index('Sandy Alcantara')
 player = st.selectbox('Choose a player:', players, index=default_ix)
+player_df = player_index(year).select(plv_df, player)
 
 # Chart Select
 charts = ['Pitch Quality','Pitch Distribution',
@@ -262,7 +305,7 @@ if chart=='Pitch Distribution':
     if handedness=='All':
         pitcher_hand = ['L','R']
     else:
-        pitcher_hand = list(plv_df.loc[(plv_df['pitchername']==player),'p_hand'].unique())
+        pitcher_hand = list(player_df['p_hand'].unique())
 
     hand_map = {
         'Left':['L'],
@@ -270,8 +313,18 @@ if chart=='Pitch Distribution':
         'Right':['R']
     }
 
-    pitches_thrown = plv_df.loc[(plv_df['pitchername']==player) &
-                                plv_df['b_hand'].isin(hand_map[handedness])].shape[0]
+    player_hist = plv_histogram(year).rollup(['pitchtype'],
+                                             {'pitchername':[player],
+                                              'b_hand':hand_map[handedness]})
+    player_pitch_stats = pitcher_cube(year).stats(['pitchtype'],
+                                                  {'pitchername':[player],
+                                                   'b_hand':hand_map[handedness]},
+                                                  ['PLV'])
+    league_plv = pitcher_cube(year).stats(['pitchtype'],
+                                          {'b_hand':hand_map[handedness],
+                                           'p_hand':pitcher_hand},
+                                          ['PLV'])['PLV']
+    pitches_thrown = int(player_pitch_stats['n'].sum())
 
     st.write('Distribution of PLV for all pitches thrown by {}{} in {}'.format(player,
                                                                                '' if handedness=='All' else f' to {handedness} Handed Hitters',
@@ -280,16 +333,10 @@ if chart=='Pitch Distribution':
 
     if pitches_thrown >= pitch_threshold:
         pitch_type_thresh = 20
-        pitch_list = list(plv_df
-                    .loc[(plv_df['pitchername']==player) &
-                         plv_df['b_hand'].isin(hand_map[handedness])]
-                    .groupby('pitchtype',as_index=False)
-                    ['pitch_id']
-                    .count()
-                    .dropna()
-                    .sort_values('pitch_id', ascending=False)
-                    .query(f'pitch_id > {pitch_type_thresh}')
-                    ['pitchtype']
+        pitch_list = list(player_pitch_stats
+                    .sort_values('n', ascending=False)
+                    .query(f'n > {pitch_type_thresh}')
+                    .index
                     )
 
     ## Chart function
@@ -299,16 +346,9 @@ if chart=='Pitch Distribution':
             ax_num = 0
             max_count = 0
             for pitch in pitch_list:
-                # Data just for that pitch type
-                chart_data = plv_df.loc[(plv_df['pitchtype']==pitch) &
-                                        plv_df['b_hand'].isin(hand_map[handedness])].copy()
-                # Restrict to 0-10
-                chart_data['PLV_clip'] = np.clip(chart_data['PLV'], a_min=0, a_max=10)
-                num_pitches = chart_data.loc[chart_data['pitchername']==player].shape[0]
-
-                # Plotting
-                sns.histplot(data=chart_data.loc[chart_data['pitchername']==player],
-                             x='PLV_clip',
+                # Plotting (binned counts for that pitch type, restricted to 0-10)
+                sns.histplot(x=plv_histogram(year).centers,
+                             weights=player_hist.loc[pitch].to_numpy(),
                              color=color_palette[pitch],
                              binwidth=0.5,
                              binrange=(0,10),
@@ -317,13 +357,13 @@ if chart=='Pitch Distribution':
                              legend=False
                             )
                 # Season Avg Line
-                axs[ax_num].axvline(chart_data.loc[chart_data['pitchername']==player,'PLV'].mean(),
+                axs[ax_num].axvline(player_pitch_stats.loc[pitch,'PLV'],
                                     color=color_palette[pitch],
                                     linestyle='--',
                                     linewidth=2.5)
 
                 # League Avg Line
-                axs[ax_num].axvline(chart_data.loc[chart_data['p_hand'].isin(pitcher_hand),'PLV'].mean(), 
+                axs[ax_num].axvline(league_plv[pitch], 
                                     color='w', 
                                     label='Lg. Avg.',
                                     alpha=0.5)
@@ -346,19 +386,12 @@ if chart=='Pitch Distribution':
                 # Fix Y-Axis size to most thrown pitch, for all pitches
                 axs[axis].set(ylim=(0,max_count*1.025))
 
-                num_pitches = plv_df.loc[(plv_df['pitchtype']==pitch_list[axis]) & 
-                                         (plv_df['pitchername']==player) &
-                                         plv_df['b_hand'].isin(hand_map[handedness])].shape[0]
-                pitch_usage = round(num_pitches / plv_df.loc[(plv_df['pitchername']==player) &
-                                                             plv_df['b_hand'].isin(hand_map[handedness])].shape[0] * 100,1)
+                num_pitches = int(player_pitch_stats.loc[pitch_list[axis],'n'])
+                pitch_usage = round(num_pitches / pitches_thrown * 100,1)
 
                 # Define the plot legend
-                axs[axis].legend([pitch_names[pitch_list[axis]]+': {:.3}'.format(plv_df.loc[(plv_df['pitchtype']==pitch_list[axis]) & 
-                                                                                            (plv_df['pitchername']==player) &
-                                                                                            plv_df['b_hand'].isin(hand_map[handedness]),'PLV'].mean()),
-                                  'Lg. Avg'+': {:.3}'.format(plv_df.loc[(plv_df['pitchtype']==pitch_list[axis]) &
-                                                                         plv_df['b_hand'].isin(hand_map[handedness]) &
-                                                                         plv_df['p_hand'].isin(pitcher_hand),'PLV'].mean())], 
+                axs[axis].legend([pitch_names[pitch_list[axis]]+': {:.3}'.format(player_pitch_stats.loc[pitch_list[axis],'PLV']),
+                                  'Lg. Avg'+': {:.3}'.format(league_plv[pitch_list[axis]])], 
                                  framealpha=0, edgecolor=pl_background, loc=(0,0.4), fontsize=14)
 
                 # Pitch Totals
@@ -390,7 +423,7 @@ elif chart=='Pitch Quality':
     if handedness=='All':
         pitcher_hand = ['L','R']
     else:
-        pitcher_hand = list(plv_df.loc[(plv_df['pitchername']==player),'p_hand'].unique())
+        pitcher_hand = list(player_df['p_hand'].unique())
 
     hand_map = {
         'Left':['L'],
@@ -398,51 +431,23 @@ elif chart=='Pitch Quality':
         'Right':['R']
     }
     
-    pla_data = pd.read_csv('https://github.com/Blandalytics/PLV_viz/blob/main/data/pla_data.csv?raw=true', encoding='latin1')
-    pq_df = (pla_data
-             .loc[(pla_data['year_played']==year) &
-                  pla_data['p_hand'].isin(pitcher_hand) &
-                  pla_data['b_hand'].isin(hand_map[handedness])]
-             .assign(total_plv = lambda x: x['num_pitches'] * x['plv'])
-      .groupby(['pitchername','pitchtype','pitcher_mlb_id'])
-      [['num_pitches','pitch_runs','total_plv','subset_ip']]
-      .agg({
-          'num_pitches':'sum',
-          'subset_ip':'sum',
-          'pitch_runs':'sum',
-          'total_plv':'sum'
-      })
-      .sort_values('pitch_runs', ascending=False)
-      .query(f'num_pitches >={pitch_threshold/20}')
-      .reset_index()
-      )
-
-    # Clean IP to actual fractions
-    pq_df['season_IP'] = pq_df['subset_ip'].groupby(pq_df['pitcher_mlb_id']).transform('sum')
-    pq_df['season_pitches'] = pq_df['num_pitches'].groupby(pq_df['pitcher_mlb_id']).transform('sum')
-
-    # Calculate PLV, in general, and per-pitchtype
-    pq_df['PLV'] = pq_df['total_plv'].groupby(pq_df['pitcher_mlb_id']).transform('sum').div(pq_df['season_pitches']).astype('float')
-    pq_df['pitchtype_plv'] = pq_df['total_plv'].div(pq_df['num_pitches'])
-
-    # Calculate PLA, in general, and per-pitchtype
-    pq_df['PLA'] = pq_df['pitch_runs'].groupby(pq_df['pitcher_mlb_id']).transform('sum').mul(9).div(pq_df['season_IP']).astype('float')
-    pq_df['pitchtype_pla'] = pq_df['pitch_runs'].mul(9).div(pq_df['subset_ip']) # ERA Scale)get_pla(year,pitch_threshold=25,p_hand=pitcher_hand,b_hand=hand_map[handedness]).reset_index().rename(columns={'Pitcher':'pitchername'})
+    pq_df = pla.season_stats(pla_rollup(year,pitcher_hand,hand_map[handedness]),
+                             pitch_threshold/20)
     
     def plv_kde(df,name,num_pitches,ax,stat='PLV',pitchtype=''):
         pitch_color = 'w' if pitchtype=='' else marker_colors[pitchtype]
         df = df.query(f'season_pitches >= {pitch_threshold}').copy() if pitchtype=='' else df.loc[df['pitchtype']==pitchtype].query(f'num_pitches >= {int(pitch_threshold/20)}').copy()
         stat = 'PLV' if pitchtype=='' else 'pitchtype_plv'
         
+        league = plv_ranks(year,pitcher_hand,hand_map[handedness],pitch_threshold).get(pitchtype, ranks.PercentileTable([]))
+        x, y, cuts = plv_curves(year,pitcher_hand,hand_map[handedness],pitch_threshold).get(pitchtype, (np.array([]), np.array([]), np.full(9, np.nan)))
+        
         val = df.loc[df['pitchername']==name,stat].mean()
-        val_percentile = np.clip(stats.percentileofscore(df[stat], val) / 100,0,1)
-
-        sns.kdeplot(df[stat], ax=ax, color='w', legend=False, cut=0)
+        val_percentile = np.clip(league.percentile(val) / 100,0,1)
 
-        x = ax.lines[-1].get_xdata()
-        y = ax.lines[-1].get_ydata()
+        ax.plot(x, y, color='w')
 
-        quantiles = [1, 0.95, 0.9, 0.75, 0.5, 0.25, 0.1, 0.05, 0]
+        quantiles = plv_quantiles
         quant_colors = sns.color_palette(f'{diverging_palette}_r',n_colors=7001)[::1000]
         
         i = -1
@@ -454,14 +459,14 @@ elif chart=='Pitch Quality':
 
         for quant in range(8):
             color = quant_colors[quant]
-            thresh = 10 if quant==0 else df[stat].quantile(quantiles[quant])
+            thresh = 10 if quant==0 else cuts[quant]
             ax.fill_between(x, 0, y, 
                             where=x < thresh, 
                             color=quant_colors[quant], 
                             alpha=1)
-        ax.vlines(df[stat].quantile(0.5), 
+        ax.vlines(cuts[4], 
                 0, 
-                np.interp(df[stat].quantile(0.5), x, y), 
+                np.interp(cuts[4], x, y), 
                 linestyle='-', color='w', alpha=1, linewidth=2)
         ax.axvline(val, 
                  ymax=0.9,
@@ -653,8 +658,9 @@ elif chart=='Pitch Quality':
     
 else:
     def movement_chart():
-        hand = plv_df.loc[(plv_df['pitchername']==player),'p_hand'].values[0]
-        move_df = plv_df.loc[(plv_df['pitchername']==player)].copy()
+        hand = player_df['p_hand'].values[0]
+        move_df = player_df.copy()
+        move_stats = pitcher_cube(year).stats(['pitchtype'], {'pitchername':[player]}, ['IVB','IHB','velo'])
         
         pitch_list = [x[0] for x in Counter(move_df['pitchtype']).most_common() if (x[0] != 'UN')]
         
@@ -669,7 +675,7 @@ else:
         ax.axhline(0, color='w', linestyle='--', linewidth=1, alpha=0.5)
         ax.axvline(0, color='w', linestyle='--', linewidth=1, alpha=0.5)
         
-        sns.scatterplot(data=move_df.groupby('pitchtype')[['IVB','IHB']].mean().reset_index(),
+        sns.scatterplot(data=move_stats[['IVB','IHB']].reset_index(),
                         x='IHB',
                         y='IVB',
                         hue='pitchtype',
@@ -692,7 +698,7 @@ else:
         for x in pitch_list:
             pitchtype_order.append(labels.index(x))
             
-            pitch_velo = move_df.loc[move_df['pitchtype']==x,'velo'].mean()
+            pitch_velo = move_stats.loc[x,'velo']
             pitch_velos[x] = f' ({pitch_velo:.1f})'
         ax.legend([handles[idx] for idx in pitchtype_order],
                   [labels[idx]+pitch_velos[labels[idx]] for idx in pitchtype_order],
@@ -728,23 +734,36 @@ else:
     movement_chart()
     
 st.title("General Pitch Quality")
-st.write('- ***Quality Pitch (QP%)***: Pitch with a PLV >= 5.5')
-st.write('- ***Average Pitch (AP%)***: Pitch with 4.5 < PLV < 5.5')
-st.write('- ***Bad Pitch (BP%)***: Pitch with a PLV <= 4.5')
-st.write('- ***QP-BP%***: Difference between QP and BP. Avg is 7%')
-
-class_df = (plv_df
-             .rename(columns={
-                 'pitchername':'Pitcher'
-             })
-             .groupby('Pitcher')
-             [['Quality Pitch','Average Pitch','Bad Pitch','pitch_id']]
-             .agg({
-                 'Quality Pitch':'mean',
-                 'Average Pitch':'mean',
-                 'Bad Pitch':'mean',
-                 'pitch_id':'count'
-             })
+col1, col2 = st.columns(2)
+with col1:
+    qp_thresh = st.number_input('Quality Pitch: PLV of at least',
+                                min_value=4.0,
+                                max_value=9.0,
+                                step=0.05,
+                                value=5.5)
+with col2:
+    bp_thresh = st.number_input('Bad Pitch: PLV below',
+                                min_value=1.0,
+                                max_value=qp_thresh,
+                                step=0.05,
+                                value=min(4.5,qp_thresh))
+
+quality_df = pd.DataFrame({
+    'pitch_id':pitcher_cube(year).rollup(['pitchername'])['n'],
+    'Quality Pitch':plv_cumulative(year).count_at_least(qp_thresh),
+    'Bad Pitch':plv_cumulative(year).count_below(bp_thresh)
+})
+quality_df['Average Pitch'] = quality_df['pitch_id'] - quality_df['Quality Pitch'] - quality_df['Bad Pitch']
+league_qp_bp = (quality_df['Quality Pitch'].sum() - quality_df['Bad Pitch'].sum()) / quality_df['pitch_id'].sum()
+quality_df[['Quality Pitch','Average Pitch','Bad Pitch']] = quality_df[['Quality Pitch','Average Pitch','Bad Pitch']].div(quality_df['pitch_id'], axis=0)
+
+st.write(f'- ***Quality Pitch (QP%)***: Pitch with a PLV >= {qp_thresh:g}')
+st.write(f'- ***Average Pitch (AP%)***: Pitch with {bp_thresh:g} <= PLV < {qp_thresh:g}')
+st.write(f'- ***Bad Pitch (BP%)***: Pitch with a PLV < {bp_thresh:g}')
+st.write(f'- ***QP-BP%***: Difference between QP and BP. Avg is {league_qp_bp:.0%}')
+
+class_df = (quality_df
+             .rename_axis('Pitcher')
              .query(f'pitch_id >={pitch_threshold}')
              .assign(QP_BP=lambda x: x['Quality Pitch'] - x['Bad Pitch'])
              .rename(columns={
@@ -12,6 +12,8 @@ from collections import Counter
 from scipy import stats
 from streamlit.components.v1 import html
 
+from plv import fetch, ranks, shared
+
 #Iframe Resizer
 # ## Define your javascript
 # my_js = """
@@ -106,17 +108,14 @@ years = [2023,
         ]
 year = st.radio('Choose a year:', years)
 # Load Data
-@st.cache_data
+@st.cache_resource
 def load_data(year):
-    df = pd.DataFrame()
-    for chunk in [1,2,3]:
-        file_name = f'https://github.com/Blandalytics/PLV_viz/blob/main/data/{year}_Pitch_Analysis_Data-{chunk}.parquet?raw=true'
-        df = pd.concat([df,
-                        pd.read_parquet(file_name)[['pitchername','pitchtype','pitch_id',
-                                                    'p_hand','IHB','IVB','called_strike_pred',
-                                                    'ball_pred','PLV','velo','pitch_extension',
-                                                    'adj_vaa','p_x','p_z']]
-                       ])
+    df = fetch.read_chunks([f'https://github.com/Blandalytics/PLV_viz/blob/main/data/{year}_Pitch_Analysis_Data-{chunk}.parquet?raw=true'
+                            for chunk in [1,2,3]],
+                           columns=['pitchername','pitchtype','pitch_id',
+                                    'p_hand','IHB','IVB','called_strike_pred',
+                                    'ball_pred','PLV','velo','pitch_extension',
+                                    'adj_vaa','p_x','p_z'])
     df = (df
           .sort_values('pitch_id')
           .astype({'pitch_id':'int'})
@@ -125,7 +124,7 @@ def load_data(year):
          )
     
     return df
-pitch_df = load_data(year)
+pitch_df = shared.view(load_data(year))
 
 # Has at least 1 pitch with at least 50 thrown
 pitcher_list = list(pitch_df.groupby(['pitchername','pitchtype'])['pitch_id'].count().reset_index().query('pitch_id >=50')['pitchername'].sort_values().unique())
@@ -150,7 +149,7 @@ def pitch_analysis_card(card_player,pitch_type):
     pitches_thrown = int(pitch_df.loc[(pitch_df['pitchername']==card_player) & (pitch_df['pitchtype']==pitch_type)].shape[0]/100)*100
     pitch_num_thresh = max(50,
                            min(pitches_thrown,
-                               int(pitch_df.loc[(pitch_df['pitchtype']==pitch_type)].groupby('pitchername')['pitch_id'].count().nlargest(75)[-1]/50)*50
+                               int(pitch_df.loc[(pitch_df['pitchtype']==pitch_type)].groupby('pitchername')['pitch_id'].count().nlargest(75).iloc[-1]/50)*50
                               )
                           )
 
@@ -181,8 +180,10 @@ def pitch_analysis_card(card_player,pitch_type):
     def min_max_scaler(x):
         return ((x-x.min())/(x.max()-x.min()))
 
+    stat_ranks = {}
     for col in ['PLV','velo','pitch_extension','IVB','IHB','adj_vaa','zone_pred']:
         pitch_stats_df[col+'_scale'] = min_max_scaler(pitch_stats_df[col])
+        stat_ranks[col] = ranks.PercentileTable(pitch_stats_df[col])
 
     chart_stats = ['velo','pitch_extension','IVB','IHB','adj_vaa','zone_pred','PLV']
     fig = plt.figure(figsize=(10,10))
@@ -304,9 +305,9 @@ def pitch_analysis_card(card_player,pitch_type):
     for stat in chart_stats:
         val = pitch_stats_df.loc[(pitch_stats_df['pitchername']==card_player),
                                  stat].item()
-        up_thresh = max(pitch_stats_df[stat].quantile(0.99),
+        up_thresh = max(stat_ranks[stat].quantile(0.99),
                         val)
-        low_thresh = min(pitch_stats_df[stat].quantile(0.01),
+        low_thresh = min(stat_ranks[stat].quantile(0.01),
                          val)
         ax = plt.subplot(grid[1, chart_stats.index(stat)])
         sns.violinplot(data=pitch_stats_df.loc[(pitch_stats_df[stat] <= up_thresh) &
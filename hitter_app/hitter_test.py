@@ -5,13 +5,18 @@ import numpy as np
 import pandas as pd
 import seaborn as sns
 import scipy as sp
+import sys
 import urllib
 
 from matplotlib import ticker
 from matplotlib import colors
+from pathlib import Path
 from PIL import Image
 from scipy import stats
-from statsmodels.nonparametric.kernel_regression import KernelReg
+
+# Shared data package lives at the repo root
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from plv import catalog, cube, derived, dtypes, index, memo, ranks, scan, shared, smooth, zone
 
 logo_loc = 'https://github.com/Blandalytics/PLV_viz/blob/main/data/PL-text-wht.png?raw=true'
 logo = Image.open(urllib.request.urlopen(logo_loc))
@@ -78,68 +83,48 @@ season_names = {
 }
 
 # Load Data
-@st.cache_data(ttl=12*3600)
 def load_season_data(year):
-    df = pd.DataFrame()
-    for month in range(3,11):
-        file_name = f'https://github.com/Blandalytics/PLV_viz/blob/main/data/{year}_PLV_App_Data-{month}.parquet?raw=true'
-        df = pd.concat([df,
-                        pd.read_parquet(file_name)[['hittername','p_hand','b_hand','pitch_id','balls','strikes','swing_agg',
-                                                    'strike_zone_judgement','decision_value','contact_over_expected',
-                                                    'adj_power','batter_wOBA','pitchtype','pitch_type_bucket',
-                                                    'in_play_input','p_x','p_z','sz_z','strike_zone_top','strike_zone_bottom'
-                                                   ]]
-                       ])
-    
-    df = df.reset_index(drop=True)
-
-    df.loc[df['p_x'].notna(),'kde_x'] = np.clip(df.loc[df['p_x'].notna(),'p_x'].astype('float').mul(12).round(0).astype('int').div(12),
-                                                -20/12,
-                                                20/12)
-    df.loc[df['sz_z'].notna(),'kde_z'] = np.clip(df.loc[df['sz_z'].notna(),'sz_z'].astype('float').mul(24).round(0).astype('int').div(24),
-                                                 -1.5,
-                                                 1.25)
-    
-    df['base_decision_value'] = df['decision_value'].groupby([df['p_hand'],
-                                                              df['b_hand'],
-                                                              df['pitchtype'],
-                                                              df['kde_x'],
-                                                              df['kde_z'],
-                                                              df['balls'],
-                                                              df['strikes']]).transform('mean')
-    df['base_power'] = df['adj_power'].groupby([df['p_hand'],
-                                                df['b_hand'],
-                                                df['pitchtype'],
-                                                df['kde_x'],
-                                                df['kde_z'],
-                                                df['balls'],
-                                                df['strikes']]).transform('mean')
-
-    df['sa_oa'] = df['swing_agg'].copy()
-    df['dv_oa'] = df['decision_value'].sub(df['base_decision_value'])
-    df['ca_oa'] = df['contact_over_expected'].copy()
-    df['pow_oa'] = df['adj_power'].sub(df['base_power'])
+    df = scan.scan_season(year,
+                          columns=['hittername','p_hand','b_hand','pitch_id','balls','strikes','swing_agg',
+                                   'strike_zone_judgement','decision_value','contact_over_expected',
+                                   'adj_power','batter_wOBA','pitchtype','pitch_type_bucket',
+                                   'in_play_input','p_x','p_z','sz_z','strike_zone_top','strike_zone_bottom'
+                                  ])
 
-    
-    df.loc[df['sz_z'].notna(),'kde_z'] = np.clip(df.loc[df['sz_z'].notna(),'p_z'].astype('float').mul(12).round(0).astype('int').div(12),
-                                                 0,
-                                                 4.5)
+    # Keep each hitter's pitches together, in pitch order
+    df = df.sort_values(['hittername','pitch_id'], ignore_index=True)
 
-    for stat in ['swing_agg','strike_zone_judgement','contact_over_expected','in_play_input']:
-        df[stat] = df[stat].mul(100).astype('float')
-    
-    # Convert to runs added
-    df['decision_value'] = df['decision_value'].div(seasonal_constants.loc[year]['run_constant']).mul(100)
-    df['batter_wOBA'] = df['batter_wOBA'].div(seasonal_constants.loc[year]['run_constant']).mul(100)
-    
-    df['count'] = df['balls'].astype('str')+'-'+df['strikes'].astype('str')
-    
-    return df
+    # Location bins, baselines, over-expected values and run conversions
+    df = derived.with_derived(df, year, run_constant=seasonal_constants.loc[year]['run_constant'])
+
+    return dtypes.apply_plan(df)
+
+@st.cache_resource(ttl=12*3600)
+def season_catalog():
+    return catalog.SeasonCatalog(load_season_data)
 
-plv_df = load_season_data(year)
+with st.spinner(f"Loading {year} data"):
+    plv_df = shared.view(season_catalog()[year])
 
-max_pitches = plv_df.groupby('hittername')['pitch_id'].count().max()
-start_val = int(plv_df.groupby('hittername')['pitch_id'].count().quantile(0.4)/50)*50
+@st.cache_resource(ttl=12*3600)
+def player_index(year):
+    return index.PlayerIndex(season_catalog()[year], 'hittername')
+
+@st.cache_resource(ttl=12*3600)
+def filter_index(year):
+    return index.BitmapIndex(season_catalog()[year], ['count','pitch_type_bucket','p_hand','b_hand'])
+
+@st.cache_resource(ttl=12*3600)
+def hitter_cube(year):
+    return cube.Cube(season_catalog()[year], cube.HITTER_KEYS, cube.HITTER_MEASURES)
+
+@st.cache_resource(ttl=12*3600)
+def selection_memo():
+    return memo.LRUMemo()
+
+hitter_pitches = hitter_cube(year).rollup(['hittername'])['n']
+max_pitches = hitter_pitches.max()
+start_val = int(hitter_pitches.quantile(0.4)/50)*50
 
 # Num Pitches threshold
 pitch_thresh = st.number_input(f'Min # of Pitches faced:',
@@ -148,22 +133,15 @@ pitch_thresh = st.number_input(f'Min # of Pitches faced:',
                                step=50, 
                                value=500)
 
-season_df = (plv_df
+season_df = (hitter_cube(year)
+             .stats(['hittername'], measures=list(season_names))
+             .reset_index()
+             .astype({'hittername':'str'})
              .rename(columns=season_names)
              .rename(columns={'hittername':'Name',
-                              'pitch_id':'Pitches'})
-             .astype({'Name':'str'})
-             .groupby('Name')
+                              'n':'Pitches'})
+             .set_index('Name')
              [['Pitches']+list(season_names.values())]
-             .agg({
-                 'Pitches':'count',
-                 'Swing Agg (%)':'mean',
-                 'SZ Judge':'mean',
-                 'Dec Value':'mean',
-                 'Contact':'mean',
-                 'Power':'mean',
-                 'HP':'mean'
-             })
              .query(f'Pitches >= {pitch_thresh}')
              .sort_values('HP', ascending=False)
             )
@@ -208,11 +186,10 @@ plv_df = plv_df.rename(columns=stat_names)
 st.title("Rolling Ability Charts")
 
 # Player
-players = list(plv_df.groupby('hittername', as_index=False)[['pitch_id','Hitter Performance']].agg({
-    'pitch_id':'count',
-    'Hitter Performance':'mean'}).query(f'pitch_id >={pitch_thresh}').sort_values('Hitter Performance', ascending=False)['hittername'])
+players = list(hitter_cube(year).stats(['hittername'], measures=['batter_wOBA']).query(f'n >={pitch_thresh}').sort_values('batter_wOBA', ascending=False).index)
 default_player = players.index('Juan Soto')
 player = st.selectbox('Choose a hitter:', players, index=default_player)
+player_df = player_index(year).select(plv_df, player)
 
 col1, col2 = st.columns([0.5,0.5])
 
@@ -293,7 +270,7 @@ handedness = st.select_slider(
 if handedness=='All':
     hitter_hand = ['L','R']
 else:
-    hitter_hand = list(plv_df.loc[(plv_df['hittername']==player),'b_hand'].unique())
+    hitter_hand = list(player_df['b_hand'].unique())
 
 hand_map = {
     'Left':['L'],
@@ -301,40 +278,52 @@ hand_map = {
     'Right':['R']
 }
 
-chart_thresh_list = (plv_df
-                     .loc[plv_df['count'].astype('str').isin(selected_options) &
-                          plv_df['pitch_type_bucket'].isin(pitchtype_select) &
-                          plv_df['b_hand'].isin(hitter_hand) &
-                          plv_df['p_hand'].isin(hand_map[handedness])
-                         ]
-                     .groupby('hittername')
-                     [['pitch_id',metric]]
-                     .agg({
-                         'pitch_id':'count',
-                         metric:'mean'
-                     })
-                     .query(f'pitch_id >= {updated_threshold}')
-                     .copy()
-                    )
-
-chart_mean = plv_df.loc[plv_df['count'].isin(selected_options) & plv_df['pitch_type_bucket'].isin(pitchtype_select),metric].mean()
-chart_90 = chart_thresh_list[metric].quantile(0.9)
-chart_75 = chart_thresh_list[metric].quantile(0.75)
-chart_25 = chart_thresh_list[metric].quantile(0.25)
-chart_10 = chart_thresh_list[metric].quantile(0.1)
-
-plv_df[metric] = plv_df[metric].replace([np.inf, -np.inf], np.nan)
-rolling_df = (plv_df
-              .sort_values('pitch_id')
-              .loc[(plv_df['hittername']==player) &
-                   plv_df['p_hand'].isin(hand_map[handedness]) &
-                   plv_df['count'].isin(selected_options) &
-                   plv_df['pitch_type_bucket'].isin(pitchtype_select),
-                   ['hittername',metric]]
-              .dropna()
-              .reset_index(drop=True)
-              .reset_index()
-             )
+metric_cols = {name: stat for stat, name in stat_names.items()}
+
+@selection_memo()
+def get_chart_thresh_list(year,metric,selected_options,pitchtype_select,hitter_hand,p_hand,updated_threshold):
+    return (hitter_cube(year)
+            .stats(['hittername'],
+                   {'count':selected_options,
+                    'pitch_type_bucket':pitchtype_select,
+                    'b_hand':hitter_hand,
+                    'p_hand':p_hand},
+                   [metric_cols[metric]])
+            .rename(columns={metric_cols[metric]:metric})
+            .query(f'n >= {updated_threshold}')
+           )
+
+@selection_memo()
+def get_chart_mean(year,metric,selected_options,pitchtype_select):
+    return hitter_cube(year).stats(filters={'count':selected_options,'pitch_type_bucket':pitchtype_select},
+                                   measures=[metric_cols[metric]])[metric_cols[metric]].iloc[0]
+
+@selection_memo()
+def get_rolling_df(year,player,metric,p_hand,selected_options,pitchtype_select):
+    return (player_df
+            .loc[filter_index(year).mask({'p_hand':p_hand,
+                                          'count':selected_options,
+                                          'pitch_type_bucket':pitchtype_select},
+                                         rows=player_index(year).rows(player)),
+                 ['hittername',metric]]
+            .replace([np.inf, -np.inf], np.nan)
+            .dropna()
+            .reset_index(drop=True)
+            .reset_index()
+           )
+
+@selection_memo()
+def get_rolling_stat(year,player,metric,p_hand,selected_options,pitchtype_select,window):
+    values = get_rolling_df(year,player,metric,p_hand,selected_options,pitchtype_select)[metric]
+    rolling_stat = values.rolling(window).mean()
+    fixed_window = window if (values.mean() < rolling_stat.max()) and (values.mean() > rolling_stat.min()) else int(window*2/3)
+    return values.rolling(window, min_periods=fixed_window).mean(), fixed_window
+
+chart_thresh_list = get_chart_thresh_list(year,metric,selected_options,pitchtype_select,hitter_hand,hand_map[handedness],updated_threshold)
+chart_mean = get_chart_mean(year,metric,selected_options,pitchtype_select)
+chart_10, chart_25, chart_75, chart_90 = ranks.PercentileTable(chart_thresh_list[metric]).quantile([0.1,0.25,0.75,0.9])
+
+rolling_df = shared.view(get_rolling_df(year,player,metric,hand_map[handedness],selected_options,pitchtype_select))
 
 window_max = max(rolling_threshold[metric],int(round(rolling_df.shape[0]/10)*7))
 
@@ -345,9 +334,7 @@ window = st.number_input(f'Choose a {rolling_denom[metric]} threshold:',
                          step=5, 
                          value=rolling_threshold[metric])
 
-rolling_df['Rolling_Stat'] = rolling_df[metric].rolling(window).mean()
-fixed_window = window if (rolling_df[metric].mean() < rolling_df['Rolling_Stat'].max()) and (rolling_df[metric].mean() > rolling_df['Rolling_Stat'].min()) else int(window*2/3)
-rolling_df['Rolling_Stat'] = rolling_df[metric].rolling(window, min_periods=fixed_window).mean()
+rolling_df['Rolling_Stat'], fixed_window = get_rolling_stat(year,player,metric,hand_map[handedness],selected_options,pitchtype_select,window)
 
 color_norm = colors.TwoSlopeNorm(vmin=chart_10, 
                                  vcenter=chart_mean,
@@ -473,13 +460,20 @@ else:
 
 st.title("PLV Heatmaps")
 
-zone_df = pd.DataFrame(columns=['x','z'])
-for x in range(-20,21):
-    for y in range(0,55):
-        zone_df.loc[len(zone_df)] = [x/12,y/12]
-
-def plv_hitter_heatmap(hitter=player,df=plv_df,year=year,pitchtype_select=pitchtype_select):
-    b_hand = df.loc[(df['hittername']==hitter),'b_hand'].unique()[0]
+smoothing_help = '''
+**Standard**: One bandwidth, based on the number of pitches seen\n
+**Data-Driven**: Each map's bandwidth picked by leave-one-out cross-validation on the hitter's pitches
+'''
+smoothing = st.radio('Heatmap Smoothing',
+                     ['Standard','Data-Driven'],
+                     index=0,
+                     horizontal=True,
+                     help=smoothing_help)
+# Candidate bandwidths (ft) for data-driven smoothing
+cv_bandwidths = np.linspace(0.1,0.5,17)
+
+def plv_hitter_heatmap(hitter=player,df=plv_df,hitter_df=player_df,year=year,pitchtype_select=pitchtype_select,cv_smoothing=smoothing=='Data-Driven'):
+    b_hand = hitter_df['b_hand'].unique()[0]
     fig= plt.figure(figsize=(7,10))
     grid = plt.GridSpec(3, 4,height_ratios=[7,7,1],hspace=0.15,
                         width_ratios=[1,1,1.1,0.9],wspace=0.025)
@@ -490,40 +484,41 @@ def plv_hitter_heatmap(hitter=player,df=plv_df,year=year,pitchtype_select=pitcht
         3:['pow_oa',plt.subplot(grid[1, 2:]),'Power',0.1]
     }
     
-    bandwidth = np.clip(df
-                        .loc[(df['hittername']==hitter) &
-                             (df['pitch_type_bucket'].isin(pitchtype_select))]
+    hitter_bucket_df = hitter_df.loc[filter_index(year).mask({'pitch_type_bucket':pitchtype_select},
+                                                             rows=player_index(year).rows(hitter))]
+    bandwidth = np.clip(hitter_bucket_df
                         .shape[0]/2000,
                         0.175,
                         0.25)
     
-    sz_top = round(df.loc[df['hittername']==hitter,'strike_zone_top'].median()*12)
-    sz_bot = round(df.loc[df['hittername']==hitter,'strike_zone_bottom'].median()*12)
+    sz_top = round(hitter_df['strike_zone_top'].median()*12)
+    sz_bot = round(hitter_df['strike_zone_bottom'].median()*12)
     sz_range = sz_top-sz_bot
     sz_mid = sz_bot + sz_range/2
     
+    # Bin the locations and run the kernel passes once for all four stats
+    stats = [stat_dict[stat][0] for stat in range(len(stat_dict))]
+    v_centers = df[stats].mean()
+    if cv_smoothing:
+        bandwidth = smooth.cv_bandwidth(zone.PLATE,
+                                        hitter_bucket_df['kde_x'],
+                                        hitter_bucket_df['kde_z'],
+                                        hitter_bucket_df[stats],
+                                        cv_bandwidths,
+                                        fill=v_centers)
+    # Empty inches count as one league-average pitch
+    kde_grids = smooth.stat_grids(zone.PLATE,
+                                  hitter_bucket_df['kde_x'],
+                                  hitter_bucket_df['kde_z'],
+                                  hitter_bucket_df[stats],
+                                  bandwidth,
+                                  fill=v_centers)
+    
     for stat in range(len(stat_dict)):
-        v_center = df[stat_dict[stat][0]].mean()
-        kde_df = pd.merge(zone_df,
-                          (df
-                           .loc[(df['hittername']==hitter) &
-                                (df['pitch_type_bucket'].isin(pitchtype_select))
-                               ]
-                           .dropna(subset=[stat_dict[stat][0],'p_x','sz_z'])
-                           [['kde_x','kde_z',stat_dict[stat][0]]]
-                          ),
-                          how='left',
-                          left_on=['x','z'],
-                          right_on=['kde_x','kde_z']).fillna({stat_dict[stat][0]:v_center})
-        
-        kernel_regression = KernelReg(endog=kde_df[stat_dict[stat][0]], 
-                                      exog= [kde_df['x'], kde_df['z']], 
-                                      bw=[bandwidth,bandwidth],
-                                      var_type='cc')
-        kde_df['kernel_stat'] = kernel_regression.fit([kde_df['x'], kde_df['z']])[0]
-        kde_df = kde_df.pivot_table(columns='x',index='z',values=['kernel_stat'], aggfunc='mean')
-
-        sns.heatmap(data=kde_df['kernel_stat'].astype('float'),
+        v_center = v_centers.iloc[stat]
+        kde_df = zone.PLATE.frame(kde_grids[stat])
+
+        sns.heatmap(data=kde_df,
                     cmap=kde_palette,
                     center=v_center,
                     vmin=v_center-stat_dict[stat][3],
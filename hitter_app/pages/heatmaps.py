@@ -5,14 +5,18 @@ import numpy as np
 import pandas as pd
 import seaborn as sns
 import scipy as sp
-import time
+import sys
 import urllib
 
 from matplotlib import ticker
 from matplotlib import colors
+from pathlib import Path
 from PIL import Image
 from scipy import stats
-from statsmodels.nonparametric.kernel_regression import KernelReg
+
+# Shared data package lives at the repo root
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from plv import catalog, cube, derived, dtypes, index, memo, scan, shared, smooth, zone
 
 logo_loc = 'https://github.com/Blandalytics/PLV_viz/blob/main/data/PL-text-wht.png?raw=true'
 logo = Image.open(urllib.request.urlopen(logo_loc))
@@ -66,58 +70,44 @@ season_names = {
 }
 
 # Load Data
-@st.cache_data(ttl=2*3600,show_spinner=f"Loading {year} data")
 def load_season_data(year):
-    df = pd.DataFrame()
-    for month in range(3,11):
-        file_name = f'https://github.com/Blandalytics/PLV_viz/blob/main/data/{year}_PLV_App_Data-{month}.parquet?raw=true'
-        df = pd.concat([df,
-                        pd.read_parquet(file_name)[['hittername','p_hand','b_hand','pitch_id','balls','strikes','swing_agg',
-                                                    'strike_zone_judgement','decision_value','contact_over_expected',
-                                                    'adj_power','batter_wOBA','pitchtype','pitch_type_bucket',
-                                                    'in_play_input','p_x','p_z','sz_z','strike_zone_top','strike_zone_bottom'
-                                                   ]]
-                       ])
-    
-    df = df.reset_index(drop=True)
-
-    df.loc[df['p_x'].notna(),'kde_x'] = np.clip(df.loc[df['p_x'].notna(),'p_x'].astype('float').mul(12).round(0).astype('int').div(12),
-                                                -20/12,
-                                                20/12)
-    df.loc[df['sz_z'].notna(),'kde_z'] = np.clip(df.loc[df['sz_z'].notna(),'sz_z'].astype('float').mul(24).round(0).astype('int').div(24),
-                                                 -1.5,
-                                                 1.25)
-    
-    df['base_decision_value'] = df['decision_value'].groupby([df['p_hand'],
-                                                              df['b_hand'],
-                                                              df['pitchtype'],
-                                                              df['kde_x'],
-                                                              df['kde_z'],
-                                                              df['balls'],
-                                                              df['strikes']]).transform('mean')
-    df['base_power'] = df['adj_power'].groupby([df['p_hand'],
-                                                df['b_hand'],
-                                                df['pitchtype'],
-                                                df['kde_x'],
-                                                df['kde_z'],
-                                                df['balls'],
-                                                df['strikes']]).transform('mean')
-
-    df['sa_oa'] = df['swing_agg'].copy()
-    df['dv_oa'] = df['decision_value'].sub(df['base_decision_value'])
-    df['ca_oa'] = df['contact_over_expected'].copy()
-    df['pow_oa'] = df['adj_power'].sub(df['base_power'])
+    df = scan.scan_season(year,
+                          columns=['hittername','p_hand','b_hand','pitch_id','balls','strikes','swing_agg',
+                                   'strike_zone_judgement','decision_value','contact_over_expected',
+                                   'adj_power','batter_wOBA','pitchtype','pitch_type_bucket',
+                                   'in_play_input','p_x','p_z','sz_z','strike_zone_top','strike_zone_bottom'
+                                  ])
 
-    
-    df.loc[df['sz_z'].notna(),'kde_z'] = np.clip(df.loc[df['sz_z'].notna(),'p_z'].astype('float').mul(12).round(0).astype('int').div(12),
-                                                 0,
-                                                 4.5)
-    
-    df['count'] = df['balls'].astype('str')+'-'+df['strikes'].astype('str')
-    
-    return df
+    # Keep each hitter's pitches together, in pitch order
+    df = df.sort_values(['hittername','pitch_id'], ignore_index=True)
+
+    # Location bins, baselines and over-expected values
+    df = derived.with_derived(df, year)
+
+    return dtypes.apply_plan(df)
+
+@st.cache_resource(ttl=2*3600)
+def season_catalog():
+    return catalog.SeasonCatalog(load_season_data)
+
+with st.spinner(f"Loading {year} data"):
+    plv_df = shared.view(season_catalog()[year])
 
-plv_df = load_season_data(year)
+@st.cache_resource(ttl=2*3600)
+def player_index(year):
+    return index.PlayerIndex(season_catalog()[year], 'hittername')
+
+@st.cache_resource(ttl=2*3600)
+def filter_index(year):
+    return index.BitmapIndex(season_catalog()[year], ['count','pitch_type_bucket','p_hand','b_hand'])
+
+@st.cache_resource(ttl=2*3600)
+def hitter_cube(year):
+    return cube.Cube(season_catalog()[year], cube.HITTER_KEYS, cube.HITTER_MEASURES)
+
+@st.cache_resource(ttl=2*3600)
+def selection_memo():
+    return memo.LRUMemo()
 
 stat_names = {
     'swing_agg':'Swing Aggression',
@@ -141,14 +131,13 @@ stat_values = {
 
 plv_df = plv_df.rename(columns=stat_names)
 # Player
-players = list(plv_df.groupby('hittername', as_index=False)[['pitch_id','Hitter Performance']].agg({
-    'pitch_id':'count',
-    'Hitter Performance':'mean'}).query(f'pitch_id >=100').sort_values('Hitter Performance', ascending=False)['hittername'])
+players = list(hitter_cube(year).stats(['hittername'], measures=['batter_wOBA']).query(f'n >=100').sort_values('batter_wOBA', ascending=False).index)
 # default_player = players.index(np.random.choice(list(plv_df.groupby('hittername', as_index=False)[['pitch_id','Hitter Performance']].agg({
 #     'pitch_id':'count',
 #     'Hitter Performance':'mean'}).query(f'pitch_id >=1500').sort_values('Hitter Performance', ascending=False)['hittername'])))
 default_player = players.index('Corey Seager')
 player = st.selectbox('Choose a hitter:', players, index=default_player)
+player_df = player_index(year).select(plv_df, player)
 
 # Pitchtype Selection
 pitchtype_help = '''
@@ -208,7 +197,7 @@ handedness = st.select_slider(
 if handedness=='All':
     hitter_hand = ['L','R']
 else:
-    hitter_hand = list(plv_df.loc[(plv_df['hittername']==player),'b_hand'].unique())
+    hitter_hand = list(player_df['b_hand'].unique())
 
 hand_map = {
     'Left':['L'],
@@ -216,17 +205,40 @@ hand_map = {
     'Right':['R']
 }
 
-zone_df = pd.DataFrame(columns=['x','z'])
-for x in range(-20,21):
-    for y in range(0,55):
-        zone_df.loc[len(zone_df)] = [x/12,y/12]
-
-heatmap_df = plv_df.loc[plv_df['p_hand'].isin(hand_map[handedness]) &
-                        plv_df['count'].isin(selected_options) &
-                        plv_df['pitch_type_bucket'].isin(pitchtype_select)].copy()
-
-def plv_hitter_heatmap(hitter=player,df=heatmap_df):
-    b_hand = df.loc[(df['hittername']==hitter),'b_hand'].unique()[0]
+def heatmap_filters(p_hand,selected_options,pitchtype_select):
+    return {'p_hand':p_hand,
+            'count':selected_options,
+            'pitch_type_bucket':pitchtype_select}
+
+# Only the league means (the heatmaps' centers) are kept, not the league rows
+@selection_memo()
+def get_league_means(year,p_hand,selected_options,pitchtype_select):
+    league_rows = filter_index(year).mask(heatmap_filters(p_hand,selected_options,pitchtype_select))
+    return plv_df.loc[league_rows, ['sa_oa','dv_oa','ca_oa','pow_oa']].mean()
+
+@selection_memo()
+def get_heatmap_df(year,p_hand,selected_options,pitchtype_select,player):
+    return filter_index(year).select(plv_df,
+                                     heatmap_filters(p_hand,selected_options,pitchtype_select),
+                                     rows=player_index(year).rows(player))
+
+league_means = get_league_means(year,hand_map[handedness],selected_options,pitchtype_select)
+hitter_heatmap_df = get_heatmap_df(year,hand_map[handedness],selected_options,pitchtype_select,player)
+
+smoothing_help = '''
+**Standard**: One bandwidth, based on the number of pitches seen\n
+**Data-Driven**: Each map's bandwidth picked by leave-one-out cross-validation on the hitter's pitches
+'''
+smoothing = st.radio('Heatmap Smoothing',
+                     ['Standard','Data-Driven'],
+                     index=0,
+                     horizontal=True,
+                     help=smoothing_help)
+# Candidate bandwidths (ft) for data-driven smoothing
+cv_bandwidths = np.linspace(0.1,0.5,17)
+
+def plv_hitter_heatmap(hitter=player,means=league_means,hitter_df=hitter_heatmap_df,cv_smoothing=smoothing=='Data-Driven'):
+    b_hand = hitter_df['b_hand'].unique()[0]
     fig= plt.figure(figsize=(7,10))
     grid = plt.GridSpec(3, 4,height_ratios=[7,7,1],hspace=0.15,
                         width_ratios=[1,1,1.1,0.9],wspace=0.025)
@@ -237,40 +249,40 @@ def plv_hitter_heatmap(hitter=player,df=heatmap_df):
         3:['pow_oa',plt.subplot(grid[1, 2:]),'Power',0.1]
     }
     
-    bandwidth = np.clip(df
-                        .loc[(df['hittername']==hitter)]
+    bandwidth = np.clip(hitter_df
                         .shape[0]/2000,
                         0.2,
                         0.25)
     
-    sz_top = round(df.loc[df['hittername']==hitter,'strike_zone_top'].median()*12)
-    sz_bot = round(df.loc[df['hittername']==hitter,'strike_zone_bottom'].median()*12)
+    sz_top = round(hitter_df['strike_zone_top'].median()*12)
+    sz_bot = round(hitter_df['strike_zone_bottom'].median()*12)
     sz_range = sz_top-sz_bot
     sz_mid = sz_bot + sz_range/2
     
+    hitter_bucket_df = hitter_df.loc[hitter_df['pitch_type_bucket'].isin(pitchtype_select)]
+    # Bin the locations and run the kernel passes once for all four stats
+    stats = [stat_dict[stat][0] for stat in range(len(stat_dict))]
+    v_centers = means[stats]
+    if cv_smoothing:
+        bandwidth = smooth.cv_bandwidth(zone.PLATE,
+                                        hitter_bucket_df['kde_x'],
+                                        hitter_bucket_df['kde_z'],
+                                        hitter_bucket_df[stats],
+                                        cv_bandwidths,
+                                        fill=v_centers)
+    # Empty inches count as one league-average pitch
+    kde_grids = smooth.stat_grids(zone.PLATE,
+                                  hitter_bucket_df['kde_x'],
+                                  hitter_bucket_df['kde_z'],
+                                  hitter_bucket_df[stats],
+                                  bandwidth,
+                                  fill=v_centers)
+    
     for stat in range(len(stat_dict)):
-        time.sleep(1.5)
-        v_center = df[stat_dict[stat][0]].mean()
-        kde_df = pd.merge(zone_df,
-                          (df
-                           .loc[(df['hittername']==hitter) &
-                                (df['pitch_type_bucket'].isin(pitchtype_select))
-                               ]
-                           .dropna(subset=[stat_dict[stat][0],'p_x','sz_z'])
-                           [['kde_x','kde_z',stat_dict[stat][0]]]
-                          ),
-                          how='left',
-                          left_on=['x','z'],
-                          right_on=['kde_x','kde_z']).fillna({stat_dict[stat][0]:v_center})
-        
-        kernel_regression = KernelReg(endog=kde_df[stat_dict[stat][0]], 
-                                      exog= [kde_df['x'], kde_df['z']], 
-                                      bw=[bandwidth,bandwidth],
-                                      var_type='cc')
-        kde_df['kernel_stat'] = kernel_regression.fit([kde_df['x'], kde_df['z']])[0]
-        kde_df = kde_df.pivot_table(columns='x',index='z',values=['kernel_stat'], aggfunc='mean')
-
-        sns.heatmap(data=kde_df['kernel_stat'].astype('float'),
+        v_center = v_centers.iloc[stat]
+        kde_df = zone.PLATE.frame(kde_grids[stat])
+
+        sns.heatmap(data=kde_df,
                     cmap=kde_palette,
                     center=v_center,
                     vmin=v_center-stat_dict[stat][3],
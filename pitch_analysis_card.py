@@ -11,6 +11,8 @@ from PIL import Image
 from collections import Counter
 from scipy import stats
 
+from plv import fetch, ranks, shared, smooth, zone
+
 ## Set Styling
 # Plot Style
 pl_white = '#FEFEFE'
@@ -101,20 +103,17 @@ years = [2023,
         ]
 year = st.radio('Choose a year:', years)
 # Load Data
-@st.cache_data
+@st.cache_resource
 def load_data(year):
-    df = pd.DataFrame()
-    for chunk in [1,2,3]:
-        file_name = f'https://github.com/Blandalytics/PLV_viz/blob/main/data/{year}_Pitch_Analysis_Data-{chunk}.parquet?raw=true'
-        load_cols = ['pitchername','pitchtype','pitch_id',
-                                                    'p_hand','b_hand','IHB','IVB','called_strike_pred',
-                                                    'ball_pred','PLV','velo','pitch_extension',
-                                                    'adj_vaa','p_x','p_z']
-        # if year == 2023:
-        #     load_cols += ['b_hand']
-        df = pd.concat([df,
-                        pd.read_parquet(file_name)[load_cols]
-                       ])
+    load_cols = ['pitchername','pitchtype','pitch_id',
+                 'p_hand','b_hand','IHB','IVB','called_strike_pred',
+                 'ball_pred','PLV','velo','pitch_extension',
+                 'adj_vaa','p_x','p_z']
+    # if year == 2023:
+    #     load_cols += ['b_hand']
+    df = fetch.read_chunks([f'https://github.com/Blandalytics/PLV_viz/blob/main/data/{year}_Pitch_Analysis_Data-{chunk}.parquet?raw=true'
+                            for chunk in [1,2,3]],
+                           columns=load_cols)
     df = (df
           .sort_values('pitch_id')
           .astype({'pitch_id':'int'})
@@ -124,50 +123,30 @@ def load_data(year):
     
     return df
 
+@st.cache_resource
+def league_densities(year):
+    df = load_data(year)
+    x_index, z_index = zone.PLATE.indices(df['p_x'], df['p_z'])
+    return {key: smooth.kde_grid(zone.PLATE, zone.PLATE.accumulate(x_index[rows], z_index[rows]))
+            for key, rows in df.groupby(['pitchtype','p_hand','b_hand']).indices.items()}
+
 def kde_calcs(df,pitcher,pitchtype,year=year):
     p_hand = df.loc[(df['pitchername']==pitcher),'p_hand'].iloc[0]
+    pitcher_df = df.loc[(df['pitchername']==pitcher) &
+                        (df['pitchtype']==pitchtype) &
+                        (df['p_hand']==p_hand)]
     kde_diffs = []
     for b_hand in ['L','R']:
-        kde_df = (df
-                  .loc[(df['pitchtype']==pitchtype) &
-                       (df['b_hand']==b_hand) &
-                       (df['p_hand']==p_hand)
-                      ]
-                  .assign(kde_x = lambda x: np.clip(x['p_x'].astype('float').mul(12).round(0).astype('int').div(12),-20/12,20/12),
-                          kde_z = lambda x: np.clip(x['p_z'].astype('float').mul(12).round(0).astype('int').div(12),0,4.5))
-                  .reset_index(drop=True)
-                 )
-        if kde_df.loc[kde_df['pitchername']==pitcher].shape[0] < 10:
+        hand_df = pitcher_df.loc[pitcher_df['b_hand']==b_hand]
+        if hand_df.shape[0] < 10:
             kde_diffs += [pd.DataFrame()]
             continue
-        x_loc_league = kde_df['kde_x']
-        y_loc_league = kde_df['kde_z']
-
-        x_loc_pitcher = kde_df.loc[kde_df['pitchername']==pitcher,'kde_x']
-        y_loc_pitcher = kde_df.loc[kde_df['pitchername']==pitcher,'kde_z']
-
-        xmin = x_loc_league.min()
-        xmax = x_loc_league.max()
-        ymin = y_loc_league.min()
-        ymax = y_loc_league.max()
-
-        X, Y = np.mgrid[xmin:xmax:41j, ymin:ymax:55j]
-        positions = np.vstack([X.ravel(), Y.ravel()])
-
-        # league matrix
-        values_league = np.vstack([x_loc_league, y_loc_league])
-        kernel_league = sp.stats.gaussian_kde(values_league)
-        f_league = np.reshape(kernel_league(positions).T, X.shape)
-
-        # pitcher matrix
-        values_pitcher = np.vstack([x_loc_pitcher, y_loc_pitcher])
-        kernel_pitcher = sp.stats.gaussian_kde(values_pitcher)
-        f_pitcher = np.reshape(kernel_pitcher(positions).T, X.shape)
-        
-        kde_diffs += [pd.DataFrame(f_pitcher-f_league).T]
+        f_league = league_densities(year)[(pitchtype, p_hand, b_hand)]
+        f_pitcher = smooth.kde_grid(zone.PLATE, zone.PLATE.accumulate(*zone.PLATE.indices(hand_df['p_x'], hand_df['p_z'])))
+        kde_diffs += [zone.PLATE.frame(f_pitcher-f_league)]
     return kde_diffs
 
-pitch_df = load_data(year)
+pitch_df = shared.view(load_data(year))
 
 pitch_thresh = 10
 
@@ -210,7 +189,7 @@ def pitch_analysis_card(card_player,pitch_type,chart_type):
     pitches_thrown = int(pitch_df.loc[(pitch_df['pitchername']==card_player) & (pitch_df['pitchtype']==pitch_type)].shape[0]/100)*100
     pitch_num_thresh = max(pitch_thresh,
                            min(pitches_thrown,
-                               int(pitch_df.loc[(pitch_df['pitchtype']==pitch_type)].groupby('pitchername')['pitch_id'].count().nlargest(75)[-1]/50)*50
+                               int(pitch_df.loc[(pitch_df['pitchtype']==pitch_type)].groupby('pitchername')['pitch_id'].count().nlargest(75).iloc[-1]/50)*50
                               )
                           )
 
@@ -241,9 +220,10 @@ def pitch_analysis_card(card_player,pitch_type,chart_type):
     def min_max_scaler(x):
         return ((x-x.min())/(x.max()-x.min()))
 
+    stat_ranks = {}
     for col in ['PLV','velo','pitch_extension','IVB','IHB','adj_vaa','zone_pred']:
         pitch_stats_df[col+'_scale'] = min_max_scaler(pitch_stats_df[col])
-        pitch_stats_df[col+'_pct'] = pitch_stats_df[col].rank(pct=True)
+        stat_ranks[col] = ranks.PercentileTable(pitch_stats_df[col])
 
     chart_stats = ['velo','pitch_extension','IVB','IHB','adj_vaa','zone_pred','PLV']
     fig = plt.figure(figsize=(10,10))
@@ -366,9 +346,9 @@ def pitch_analysis_card(card_player,pitch_type,chart_type):
         if chart_type=='Violin':
             val = pitch_stats_df.loc[(pitch_stats_df['pitchername']==card_player),
                                      stat].item()
-            up_thresh = max(pitch_stats_df[stat].quantile(0.99),
+            up_thresh = max(stat_ranks[stat].quantile(0.99),
                             val)
-            low_thresh = min(pitch_stats_df[stat].quantile(0.01),
+            low_thresh = min(stat_ranks[stat].quantile(0.01),
                              val)
             ax = plt.subplot(grid[1, chart_stats.index(stat)])
             sns.violinplot(data=pitch_stats_df.loc[(pitch_stats_df[stat] <= up_thresh) &
@@ -434,8 +414,8 @@ def pitch_analysis_card(card_player,pitch_type,chart_type):
                                                  top + plot_height))
             ax.xaxis.set_label_position('top')
         else:
-            plot_val = pitch_stats_df.loc[(pitch_stats_df['pitchername']==card_player),stat+'_pct'].item()
             text_val = pitch_stats_df.loc[(pitch_stats_df['pitchername']==card_player),stat].item()
+            plot_val = stat_ranks[stat].percentile(text_val) / 100
 
             format_dict = {
                 'PLV':f'{text_val:.2f}',
@@ -12,6 +12,7 @@ from sklearn.neighbors import KNeighborsClassifier
 from pathlib import Path
 from xgboost import XGBClassifier
 from collections import Counter
+from plv import players
 
 import seaborn as sns
 import matplotlib.pyplot as plt
@@ -26,12 +27,14 @@ def strikezone_z(dataframe,top_column,bottom_column):
     
     return dataframe['p_z'].sub(dataframe['sz_mid']).div(dataframe['sz_height'])
 
-model_df = pd.DataFrame()
-for year in [2020,2021,2022,2023]:
-    for chunk in [1,2,3]:
-        model_df = pd.concat([model_df,
-                             pd.read_parquet(f'{year}_PLV_App_Data-{chunk}.parquet')])
-        
+player = 'Ross Stripling'
+year = 2023
+
+# Only the player's pitches, read from the player-sorted export when there is one
+pitchers = players.list_players(year, 'pitcher')
+player_id = pitchers.loc[pitchers['pitchername']==player,'pitcher_mlb_id'].iloc[0]
+model_df = players.read_player(year, 'pitcher', player_id)
+
 model_df['sz_z'] = strikezone_z(model_df,'strike_zone_top','strike_zone_bottom')
 model_df = model_df.reset_index(drop=True)
 
@@ -110,11 +113,9 @@ def generate_df(df,player,stat,year,game_date):
                                                                                                               (test_df['pitch_group']==group),stat].std())
     return test_df.copy()
   
-player = 'Ross Stripling'
 game_date = model_df.loc[model_df['pitchername']==player,'game_played'].max().strftime('%Y-%m-%d')
 game_text = (game_date[5:7] if game_date[5]!='0' else game_date[6])+'/'+(game_date[-2:] if game_date[-2]!='0' else game_date[-1])+'/'+game_date[2:4]
 stat = 'velo'
-year = 2023
 chart_df = generate_df(model_df,
                        player,
                        stat,
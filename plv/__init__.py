@@ -0,0 +1 @@
+"""Shared data layer for the PLV Streamlit apps."""
@@ -0,0 +1,72 @@
+"""Lazily loaded season frames kept resident under a memory cap."""
+import os
+import threading
+
+from collections import OrderedDict
+
+import pandas as pd
+
+from plv import dtypes
+
+MAX_BYTES = int(os.environ.get('PLV_CATALOG_BYTES', 2**30))
+
+
+class SeasonCatalog:
+    """Season frames built by ``loader(year)`` on first access.
+
+    Seasons stay resident while their combined size fits in ``max_bytes``; past
+    that the least recently used ones are dropped. The season just touched is
+    always kept, so one season larger than the cap still loads. Safe to share
+    across sessions: concurrent requests for the same season load it once.
+    """
+
+    def __init__(self, loader, max_bytes=MAX_BYTES):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.seasons = OrderedDict()
+        self.sizes = {}
+        self.lock = threading.Lock()
+        self.loading = {}
+
+    def __contains__(self, year):
+        return year in self.seasons
+
+    def __getitem__(self, year):
+        with self.lock:
+            if year in self.seasons:
+                self.seasons.move_to_end(year)
+                return self.seasons[year]
+            year_lock = self.loading.setdefault(year, threading.Lock())
+        with year_lock:
+            with self.lock:
+                if year in self.seasons:
+                    self.seasons.move_to_end(year)
+                    return self.seasons[year]
+            df = self.loader(year)
+            with self.lock:
+                self.seasons[year] = df
+                self.sizes[year] = int(df.memory_usage(deep=True).sum())
+                self._evict()
+            return df
+
+    def _evict(self):
+        while len(self.seasons) > 1 and self.nbytes() > self.max_bytes:
+            year, _ = self.seasons.popitem(last=False)
+            del self.sizes[year]
+
+    def resident(self):
+        return list(self.seasons)
+
+    def nbytes(self):
+        return sum(self.sizes.values())
+
+    def frame(self, years, columns=None):
+        """Rows of several seasons in one frame, with a ``year`` column added."""
+        frames = []
+        for year in years:
+            df = self[year]
+            frames.append((df if columns is None else df[columns]).assign(year=year))
+        if not frames:
+            return pd.DataFrame(columns=(columns or []) + ['year'])
+        # Category levels differ between seasons, so re-apply the plan to the union
+        return dtypes.apply_plan(pd.concat(frames, ignore_index=True))
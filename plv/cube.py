@@ -0,0 +1,121 @@
+"""Aggregate cubes over the cached season frames."""
+import numpy as np
+import pandas as pd
+
+PITCHER_KEYS = ['pitchername','pitchtype','p_hand','b_hand','month']
+PITCHER_MEASURES = ['PLV','pitch_runs','velo','IVB','IHB']
+HITTER_KEYS = ['hittername','count','pitch_type_bucket','p_hand','b_hand']
+HITTER_MEASURES = ['swing_agg','strike_zone_judgement','decision_value','in_play_input',
+                   'contact_over_expected','adj_power','batter_wOBA']
+
+
+class Cube:
+    """Pitch counts plus per-measure counts, sums and sums of squares for every
+    observed combination of ``keys``.
+
+    Any mean or standard deviation over a subset of the keys (and a filter on
+    them) is a sum over cells, so views never go back to the pitch-level rows.
+    Cells keep missing keys, so filtered totals match the rows they came from.
+    """
+
+    def __init__(self, df, keys, measures):
+        self.keys = list(keys)
+        self.measures = list(measures)
+        values = df[self.measures].astype('float64')
+        frame = pd.concat([values,
+                           values.pow(2).add_suffix('_sq'),
+                           values.notna().astype('int64').add_suffix('_n')],
+                          axis=1)
+        frame['n'] = 1
+        self.cells = (frame
+                      .groupby([df[key] for key in self.keys], observed=True, dropna=False, sort=False)
+                      .sum()
+                      .reset_index())
+
+    def rollup(self, by=(), filters=None):
+        """Summed cells per combination of ``by``, after ``{key: [values]}`` filters."""
+        cells = self.cells
+        if filters:
+            mask = np.ones(len(cells), dtype=bool)
+            for key, values in filters.items():
+                mask &= cells[key].isin(values).to_numpy()
+            cells = cells.loc[mask]
+        columns = [col for col in cells.columns if col not in self.keys]
+        if not by:
+            return cells[columns].sum().to_frame().T
+        return cells.groupby(list(by), observed=True)[columns].sum()
+
+    def stats(self, by=(), filters=None, measures=None):
+        """Pitch count ``n`` with the mean and sample standard deviation of each measure."""
+        totals = self.rollup(by, filters)
+        out = pd.DataFrame({'n': totals['n']}, index=totals.index)
+        for measure in measures or self.measures:
+            n = totals[f'{measure}_n']
+            mean = totals[measure].div(n.where(n > 0))
+            out[measure] = mean
+            out[f'{measure}_std'] = np.sqrt(totals[f'{measure}_sq'].sub(n.mul(mean.pow(2)))
+                                            .div(n.sub(1).where(n > 1))
+                                            .clip(lower=0))
+        return out
+
+
+PLV_EDGES = np.arange(0, 10.5, 0.5)
+
+
+class Histogram:
+    """Counts of ``column`` in the bins between ``edges`` for every observed
+    combination of ``keys``. Values outside the edges are clipped into the end
+    bins; missing values aren't counted.
+    """
+
+    def __init__(self, df, keys, column, edges=PLV_EDGES):
+        self.keys = list(keys)
+        self.edges = np.asarray(edges, dtype='float64')
+        n_bins = len(self.edges) - 1
+        values = df[column].to_numpy(dtype='float64')
+        valid = ~np.isnan(values)
+        bins = np.clip(np.searchsorted(self.edges, values[valid], side='right') - 1, 0, n_bins - 1)
+        groups = df[self.keys].groupby(self.keys, observed=True, dropna=False, sort=False)
+        codes = groups.ngroup().to_numpy()[valid]
+        self.cells = groups.size().reset_index()[self.keys]
+        self.counts = (np.bincount(codes * n_bins + bins, minlength=len(self.cells) * n_bins)
+                       .reshape(len(self.cells), n_bins))
+
+    @property
+    def centers(self):
+        return (self.edges[:-1] + self.edges[1:]) / 2
+
+    def rollup(self, by=(), filters=None):
+        """Summed bin counts, one row per combination of ``by`` (or one array without it)."""
+        mask = np.ones(len(self.cells), dtype=bool)
+        for key, values in (filters or {}).items():
+            mask &= self.cells[key].isin(values).to_numpy()
+        counts = pd.DataFrame(self.counts[mask], index=self.cells.index[mask])
+        if not by:
+            return counts.sum().to_numpy()
+        return counts.groupby([self.cells.loc[mask, key] for key in by], observed=True).sum()
+
+
+FINE_PLV_EDGES = np.arange(0, 1001) / 100
+
+
+class CumulativeHistogram:
+    """Per-group counts of ``column`` below each edge of a fine grid.
+
+    Counting the values under (or at/above) any threshold on the grid is then a
+    column lookup, with no pass over the pitch-level rows. Thresholds between
+    edges snap to the nearest one.
+    """
+
+    def __init__(self, df, key, column, edges=FINE_PLV_EDGES):
+        hist = Histogram(df, [key], column, edges)
+        counts = hist.rollup([key])
+        self.edges = hist.edges
+        self.below = pd.DataFrame(np.c_[np.zeros(len(counts), dtype='int64'), counts.to_numpy().cumsum(axis=1)],
+                                  index=counts.index)
+
+    def count_below(self, threshold):
+        return self.below.iloc[:, int(np.abs(self.edges - threshold).argmin())]
+
+    def count_at_least(self, threshold):
+        return self.below.iloc[:, -1].sub(self.count_below(threshold))
@@ -0,0 +1,151 @@
+"""Persisted derived columns for the batter season frames.
+
+The location bins, pitch baselines, over-expected values and count only
+change when the season data does, so they're written once per season and data
+version to an Arrow IPC file next to the store, in their final dtypes, and
+memory-mapped on every later start. The run conversions depend on the app's
+run constant, so they're applied after mapping rather than persisted.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from plv import dtypes, expected, store, zone
+
+# Bump whenever compute() changes so stale files are rebuilt
+DERIVED_VERSION = 3
+DERIVED_DIR = 'derived'
+
+BIN_COLUMNS = ['kde_x','kde_z','base_decision_value','base_power',
+               'sa_oa','dv_oa','ca_oa','pow_oa','count']
+PERCENT_COLUMNS = ['swing_agg','strike_zone_judgement','contact_over_expected','in_play_input']
+RUN_COLUMNS = ['decision_value','batter_wOBA']
+BASELINE_KEYS = ['p_hand','b_hand','pitchtype','x_bin','sz_z_bin','balls','strikes']
+
+
+def baseline_table(df):
+    """League decision value and power for each handedness, pitch type, location and count."""
+    keys = dict(zip(BASELINE_KEYS, [df['p_hand'], df['b_hand'], df['pitchtype'],
+                                    *zone.BASELINE.numbers(df['p_x'], df['sz_z']), df['balls'], df['strikes']]))
+    return expected.ExpectedValueTable(keys, {'decision_value': df['decision_value'],
+                                              'adj_power': df['adj_power']})
+
+
+def compute(df):
+    """Derived columns for ``df``, indexed like it and cast by the dtype plan."""
+    out = pd.DataFrame(index=df.index)
+    kde_x, kde_z = zone.PLATE.snap(df['p_x'], df['p_z'])
+    out['kde_x'] = kde_x
+
+    baselines = baseline_table(df)
+    out['base_decision_value'] = baselines.lookup('decision_value').astype(df['decision_value'].dtype)
+    out['base_power'] = baselines.lookup('adj_power').astype(df['adj_power'].dtype)
+
+    out['sa_oa'] = df['swing_agg'].astype('float')
+    out['dv_oa'] = df['decision_value'].sub(out['base_decision_value'])
+    out['ca_oa'] = df['contact_over_expected'].astype('float')
+    out['pow_oa'] = df['adj_power'].sub(out['base_power'])
+
+    out['kde_z'] = np.where(df['sz_z'].notna(), kde_z, np.nan)
+    out['count'] = df['balls'].astype('str')+'-'+df['strikes'].astype('str')
+    return dtypes.apply_plan(out)
+
+
+def run_conversions(df, run_constant):
+    """Percentage stats scaled to 0-100 and decision value / HP converted to runs added per 100 pitches."""
+    out = {}
+    for stat in PERCENT_COLUMNS:
+        out[stat] = df[stat].mul(100).astype('float')
+    for stat in RUN_COLUMNS:
+        out[stat] = df[stat].div(run_constant).mul(100)
+    return out
+
+
+def data_version(year, root=store.STORE_ROOT):
+    """Key for a season's derived file, or None when the season isn't in the store."""
+    if not store.has_season(year, root):
+        return None
+    months = store.read_manifest(root)['seasons'][str(year)]['months']
+    key = json.dumps({'months': {month: info['sha256'] for month, info in months.items()},
+                      'version': DERIVED_VERSION}, sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def derived_path(year, version, root=store.STORE_ROOT):
+    return Path(root) / DERIVED_DIR / f'{year}-{version}.arrow'
+
+
+def _write(path, pitch_ids, derived):
+    # Keep NaN as NaN (not null) so reading back can map the buffers directly
+    table = pa.table({'pitch_id': pa.array(np.asarray(pitch_ids)),
+                      **{col: pa.array(derived[col], from_pandas=False)
+                         for col in derived.columns}})
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # The version covers the season's files and DERIVED_VERSION, so a file for
+    # the season with another version is stale. Other writers may be sweeping
+    # too, and a file still mapped elsewhere can't always be removed; it's left
+    # for a later sweep.
+    year, version = path.stem.split('-', 1)
+    for stale in path.parent.glob(f'{year}-*.arrow'):
+        if stale.stem.split('-', 1)[1] != version:
+            try:
+                stale.unlink()
+            except OSError:
+                pass
+
+    # Every writer gets its own temp file; sessions loading the same season
+    # can write the same path at once
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f'{path.stem}.', suffix='.tmp', delete=False) as f:
+        tmp = Path(f.name)
+    try:
+        with ipc.new_file(str(tmp), table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, path)
+    except OSError:
+        # Losing the rename to another writer of the same version is fine
+        if not path.exists():
+            raise
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _read(path):
+    return ipc.open_file(pa.memory_map(str(path))).read_all()
+
+
+def with_derived(df, year, run_constant=None, root=store.STORE_ROOT):
+    """``df`` with the derived columns added (or replaced), mapping them from disk when possible.
+
+    With ``run_constant`` the percentage stats and run values are converted
+    as well (see ``run_conversions``).
+    """
+    version = data_version(year, root)
+    derived = None
+    if version is not None:
+        path = derived_path(year, version, root)
+        table = None
+        if path.exists():
+            try:
+                table = _read(path)
+            except (pa.ArrowInvalid, OSError):
+                # Truncated or corrupt: recomputed and rewritten below
+                pass
+        if table is not None and np.array_equal(table.column('pitch_id').to_numpy(), df['pitch_id'].to_numpy()):
+            derived = table.drop(['pitch_id']).to_pandas(split_blocks=True)
+            derived.index = df.index
+    if derived is None:
+        derived = compute(df)
+        if version is not None:
+            _write(derived_path(year, version, root), df['pitch_id'], derived)
+    df = df.assign(**{col: derived[col] for col in derived.columns})
+    if run_constant is not None:
+        df = df.assign(**run_conversions(df, run_constant))
+    return df
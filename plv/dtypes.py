@@ -0,0 +1,90 @@
+"""Compact dtypes for the cached season frames.
+
+Names and codes become categoricals, ball/strike counts int8 and model
+outputs/locations float32. ``memory_report`` shows what each column saves::
+
+    python -m plv.dtypes 2023
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+COUNTS = ['0-0', '1-0', '2-0', '3-0', '0-1', '1-1', '2-1', '3-1', '0-2', '1-2', '2-2', '3-2']
+COUNT_DTYPE = pd.CategoricalDtype(COUNTS, ordered=True)
+
+CATEGORY_COLS = ['pitchername','hittername','pitchtype','pitch_type_bucket',
+                 'p_hand','b_hand']
+INT8_COLS = ['balls','strikes','month']
+FLOAT32_COLS = [
+    # Locations
+    'p_x','p_z','sz_z','strike_zone_top','strike_zone_bottom','kde_x','kde_z',
+    # Pitch characteristics
+    'velo','IHB','IVB','pitch_extension','adj_vaa',
+    # Model outputs
+    'PLV','pitch_runs','called_strike_pred','ball_pred','in_play_input',
+    'swing_agg','strike_zone_judgement','decision_value','contact_over_expected',
+    'adj_power','batter_wOBA',
+    # Baselines and over-expected values
+    'base_decision_value','base_power','sa_oa','dv_oa','ca_oa','pow_oa',
+]
+
+
+def apply_plan(df):
+    """Cast every planned column present in ``df``; other columns are left alone."""
+    casts = {}
+    for col in CATEGORY_COLS:
+        if col in df and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            casts[col] = 'category'
+    for col in INT8_COLS:
+        if col in df and df[col].dtype != 'int8':
+            casts[col] = 'int8'
+    for col in FLOAT32_COLS:
+        if col in df and df[col].dtype != 'float32':
+            casts[col] = 'float32'
+    # Columns already in their planned dtype (e.g. memory-mapped ones) are left as they are
+    df = df.astype(casts)
+    if 'count' in df and df['count'].dtype != COUNT_DTYPE:
+        df['count'] = df['count'].astype(COUNT_DTYPE)
+    return df
+
+
+def memory_report(before, after):
+    """Deep memory use per column before and after the plan, largest savings first."""
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.astype('str'),
+        'dtype_after': after.dtypes.astype('str'),
+        'bytes_before': before.memory_usage(index=False, deep=True),
+        'bytes_after': after.memory_usage(index=False, deep=True),
+    }).dropna(subset=['bytes_before','bytes_after'])
+    report['bytes_saved'] = report['bytes_before'].sub(report['bytes_after'])
+    report['ratio'] = report['bytes_before'].div(report['bytes_after'].replace(0, np.nan))
+    report.loc['Total'] = ['', '',
+                           report['bytes_before'].sum(),
+                           report['bytes_after'].sum(),
+                           report['bytes_saved'].sum(),
+                           report['bytes_before'].sum() / max(report['bytes_after'].sum(), 1)]
+    return report.sort_values('bytes_saved', ascending=False)
+
+
+def main(argv=None):
+    from plv import scan, store
+
+    parser = argparse.ArgumentParser(prog='python -m plv.dtypes',
+                                     description='Bytes saved per column by the dtype plan.')
+    parser.add_argument('year', type=int)
+    parser.add_argument('--root', default=store.STORE_ROOT)
+    args = parser.parse_args(argv)
+
+    columns = [col for col in CATEGORY_COLS + INT8_COLS + FLOAT32_COLS if col in scan.APP_COLUMNS]
+    before = scan.scan_season(args.year, columns=columns, root=args.root)
+    before['count'] = before['balls'].astype('str')+'-'+before['strikes'].astype('str')
+    # Match what the loaders cache today: object strings and float64 numbers
+    before = before.astype({col: 'object' for col in CATEGORY_COLS + ['count'] if col in before})
+    before = before.astype({col: 'float64' for col in FLOAT32_COLS if col in before})
+    after = apply_plan(before)
+    print(memory_report(before, after).to_string())
+
+
+if __name__ == '__main__':
+    main()
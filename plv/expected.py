@@ -0,0 +1,84 @@
+"""Expected-value tables over integer-packed composite keys."""
+import numpy as np
+import pandas as pd
+
+
+def _codes(values, levels=None):
+    """Integer codes of ``values`` (-1 for missing or unseen) and the levels they index.
+
+    Whole-number keys (counts, location bins) are offset from their minimum
+    instead of hashed.
+    """
+    if levels is None:
+        if pd.api.types.is_numeric_dtype(values):
+            values = np.asarray(values, dtype='float64')
+            present = ~np.isnan(values)
+            if present.any() and np.all(values[present] == np.round(values[present])):
+                lo, hi = int(values[present].min()), int(values[present].max())
+                codes = np.where(present, values - lo, -1).astype('int64')
+                return codes, pd.Index(np.arange(lo, hi + 1))
+        codes, levels = pd.factorize(values, sort=True)
+        return codes.astype('int64'), pd.Index(levels)
+    return levels.get_indexer(pd.Index(values)).astype('int64'), levels
+
+
+class ExpectedValueTable:
+    """Mean of each of ``values`` for every combination of ``keys``.
+
+    Each key is factorized to integer codes and the codes are packed into one
+    mixed-radix integer per row, so building the table is a bincount of sums
+    and counts and looking up a row's expected value is a single gather. Rows
+    with a missing key get NaN, and missing values aren't counted, as with
+    ``groupby(keys).transform('mean')``. ``rows`` keeps the packed key of
+    every row the table was built from, so their expected values need no
+    second pass over the keys.
+    """
+
+    def __init__(self, keys, values):
+        self.names = list(keys)
+        packed, self.levels = self._pack(keys.values())
+        self.rows = packed
+        self.shape = tuple(len(levels) for levels in self.levels)
+        size = int(np.prod(self.shape, dtype='int64'))
+        valid = packed >= 0
+        self.counts = np.bincount(packed[valid], minlength=size)
+        self.means = {}
+        for name, value in values.items():
+            value = np.asarray(value, dtype='float64')
+            counted = valid & ~np.isnan(value)
+            sums = np.bincount(packed[counted], weights=value[counted], minlength=size)
+            counts = np.bincount(packed[counted], minlength=size)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                self.means[name] = sums / counts
+
+    def _pack(self, columns, levels=None):
+        packed = None
+        valid = None
+        all_levels = []
+        for i, column in enumerate(columns):
+            codes, column_levels = _codes(column, None if levels is None else levels[i])
+            all_levels.append(column_levels)
+            if packed is None:
+                packed, valid = codes.copy(), codes >= 0
+            else:
+                packed = packed * len(column_levels) + codes
+                valid &= codes >= 0
+        packed[~valid] = -1
+        return packed, all_levels
+
+    def pack(self, keys):
+        """Packed key of each row of ``keys`` (columns in table order), -1 where it's not in the table."""
+        packed, _ = self._pack(keys, self.levels)
+        return packed
+
+    def lookup(self, name, keys=None):
+        """Expected ``name`` for each row of ``keys``, or of the frame the table was built from."""
+        packed = self.rows if keys is None else self.pack(keys)
+        means = self.means[name]
+        return np.where(packed >= 0, means[np.maximum(packed, 0)], np.nan)
+
+    def to_frame(self):
+        """One row per observed key combination, with its row count ``n`` and means."""
+        index = pd.MultiIndex.from_product(self.levels, names=self.names)
+        frame = pd.DataFrame({'n': self.counts, **self.means}, index=index)
+        return frame.loc[frame['n'] > 0]
@@ -0,0 +1,74 @@
+"""Concurrent, retrying reads of the chunked parquet files on GitHub."""
+import io
+import time
+import urllib.error
+import urllib.request
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+MAX_WORKERS = 8
+RETRIES = 3
+BACKOFF = 0.5 # seconds, doubled after every failed attempt
+TIMEOUT = 60
+TRANSIENT_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def is_remote(src):
+    return str(src).startswith('http')
+
+
+def _is_transient(err):
+    if isinstance(err, urllib.error.HTTPError):
+        return err.code in TRANSIENT_CODES
+    return isinstance(err, (urllib.error.URLError, TimeoutError, ConnectionError))
+
+
+def fetch_bytes(url, retries=RETRIES, backoff=BACKOFF, timeout=TIMEOUT):
+    """Body of ``url``, retrying timeouts, dropped connections and 5xx/429 responses."""
+    for attempt in range(retries + 1):
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as response:
+                return response.read()
+        except Exception as err:
+            if attempt == retries or not _is_transient(err):
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+
+def read_parquet(src, columns=None, filters=None, retries=RETRIES):
+    if is_remote(src):
+        src = io.BytesIO(fetch_bytes(src, retries=retries))
+    return pd.read_parquet(src, columns=columns, filters=filters)
+
+
+def read_chunks(sources, columns=None, filters=None, max_workers=MAX_WORKERS, retries=RETRIES):
+    """Read every chunk on a thread pool and concatenate once, keeping source order."""
+    sources = list(sources)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sources)))) as pool:
+        frames = list(pool.map(lambda src: read_parquet(src, columns, filters, retries), sources))
+    return pd.concat(frames, ignore_index=True)
+
+
+def download(src, dest, retries=RETRIES):
+    """Copy ``src`` (URL or local path) to ``dest`` atomically.
+
+    ``dest``'s directory is only created once ``src`` has been read, so a
+    failed download leaves nothing behind.
+    """
+    dest = Path(dest)
+    tmp = dest.with_suffix('.tmp')
+    data = fetch_bytes(src, retries=retries) if is_remote(src) else Path(src).read_bytes()
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp.write_bytes(data)
+    tmp.replace(dest)
+    return dest
+
+
+def download_all(pairs, max_workers=MAX_WORKERS, retries=RETRIES):
+    """Run :func:`download` over ``(src, dest)`` pairs concurrently."""
+    pairs = list(pairs)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pairs)))) as pool:
+        return list(pool.map(lambda pair: download(*pair, retries=retries), pairs))
@@ -0,0 +1,78 @@
+"""Row indexes over the cached season frames."""
+import numpy as np
+import pandas as pd
+
+
+class PlayerIndex:
+    """Contiguous row range of every player in a frame sorted by ``column``.
+
+    ``select(df, player)`` is a positional slice, so its cost scales with the
+    player's pitch count rather than the league's. ``df`` must have the same
+    row order as the frame the index was built from (e.g. a ``shared.view`` of it).
+    """
+
+    def __init__(self, df, column):
+        values = df[column].to_numpy()
+        codes, uniques = pd.factorize(values)
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.array([], dtype='int')
+        if len(starts) != len(uniques):
+            raise ValueError(f'frame must be sorted by {column!r} to build a PlayerIndex')
+        stops = np.r_[starts[1:], len(codes)]
+        self.column = column
+        self.n_rows = len(codes)
+        self.ranges = {values[start]: (int(start), int(stop)) for start, stop in zip(starts, stops)}
+
+    def __contains__(self, player):
+        return player in self.ranges
+
+    def __len__(self):
+        return len(self.ranges)
+
+    def rows(self, player):
+        start, stop = self.ranges.get(player, (0, 0))
+        return slice(start, stop)
+
+    def select(self, df, player):
+        if len(df) != self.n_rows:
+            raise ValueError('frame does not match the indexed frame')
+        return df.iloc[self.rows(player)]
+
+    def counts(self):
+        return pd.Series({player: stop - start for player, (start, stop) in self.ranges.items()},
+                         dtype='int64')
+
+
+class BitmapIndex:
+    """Packed per-value bitmaps over low-cardinality filter columns.
+
+    A filter such as ``{'count': ['0-2', '1-2'], 'p_hand': ['L']}`` is the AND
+    across columns of the OR within each column, evaluated on packed bytes and
+    unpacked only over the requested ``rows``.
+    """
+
+    def __init__(self, df, columns):
+        self.n_rows = len(df)
+        self.bitmaps = {}
+        for column in columns:
+            codes, uniques = pd.factorize(df[column])
+            self.bitmaps[column] = {value: np.packbits(codes == code) for code, value in enumerate(uniques)}
+
+    def values(self, column):
+        return list(self.bitmaps[column])
+
+    def mask(self, filters, rows=slice(None)):
+        start, stop, _ = rows.indices(self.n_rows)
+        first, last = start // 8, (stop + 7) // 8
+        bits = np.full(last - first, 0xFF, dtype='uint8')
+        for column, values in filters.items():
+            matched = np.zeros_like(bits)
+            for value in values:
+                if value in self.bitmaps[column]:
+                    matched |= self.bitmaps[column][value][first:last]
+            bits &= matched
+        return np.unpackbits(bits).astype(bool)[start - first * 8:stop - first * 8]
+
+    def select(self, df, filters, rows=slice(None)):
+        if len(df) != self.n_rows:
+            raise ValueError('frame does not match the indexed frame')
+        return df.iloc[rows].loc[self.mask(filters, rows)]
@@ -0,0 +1,81 @@
+"""Byte-capped LRU memo for per-selection results in the Streamlit apps."""
+import functools
+import os
+import sys
+import threading
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+MAX_BYTES = int(os.environ.get('PLV_MEMO_BYTES', 512 * 2**20))
+
+
+def normalize(key):
+    """Hashable form of a key tuple; list and set parts (widget multi-selections) become sorted tuples."""
+    return tuple(tuple(sorted(part)) if isinstance(part, (list, set, frozenset)) else part
+                 for part in key)
+
+
+def nbytes(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(nbytes(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class LRUMemo:
+    """Results of ``compute()`` keyed on the widget state that produced them.
+
+    Entries are evicted least recently used first once their combined size
+    passes ``max_bytes``; a result larger than the cap is returned but not kept.
+    Stored values are shared, so callers that modify a frame should take a
+    ``shared.view`` of it first.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def nbytes(self):
+        return sum(self.sizes.values())
+
+    def get(self, key, compute):
+        key = normalize(key)
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            self.misses += 1
+        value = compute()
+        size = nbytes(value)
+        with self.lock:
+            if size <= self.max_bytes:
+                self.entries[key] = value
+                self.sizes[key] = size
+                while self.nbytes() > self.max_bytes:
+                    old, _ = self.entries.popitem(last=False)
+                    del self.sizes[old]
+        return value
+
+    def __call__(self, fn):
+        """Decorator form: memoize ``fn`` on its name and arguments."""
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return self.get((fn.__qualname__,) + args + tuple(sorted(kwargs.items())),
+                            lambda: fn(*args, **kwargs))
+        return wrapper
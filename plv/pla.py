@@ -0,0 +1,58 @@
+"""Pitch Level Average (PLA) rollups from ``pla_data.csv``.
+
+The file holds one row per season, pitcher, pitch type and handedness
+matchup. It's read once; hand selections pick a pitcher x pitch type rollup
+and the minimum-pitches threshold is a filter on it.
+"""
+import pandas as pd
+
+PLA_URL = 'https://github.com/Blandalytics/PLV_viz/blob/main/data/pla_data.csv?raw=true'
+PLA_DTYPES = {'year_played':'int16',
+              'pitchername':'category',
+              'pitcher_mlb_id':'int32',
+              'pitchtype':'category',
+              'p_hand':'category',
+              'b_hand':'category',
+              'num_pitches':'int32',
+              'subset_ip':'float64',
+              'plv':'float64',
+              'pitch_runs':'float64'}
+
+
+def load(source=PLA_URL):
+    df = pd.read_csv(source, encoding='latin1', dtype=PLA_DTYPES)
+    df['total_plv'] = df['num_pitches'] * df['plv']
+    return df
+
+
+def rollup(pla_data, year, p_hand=['L','R'], b_hand=['L','R']):
+    """Pitcher x pitch type totals for one season and handedness selection, most pitch runs first."""
+    return (pla_data
+            .loc[(pla_data['year_played']==year) &
+                 pla_data['p_hand'].isin(p_hand) &
+                 pla_data['b_hand'].isin(b_hand)]
+            .groupby(['pitchername','pitchtype','pitcher_mlb_id'], observed=True)
+            [['num_pitches','pitch_runs','total_plv','subset_ip']]
+            .sum()
+            .sort_values('pitch_runs', ascending=False)
+            .reset_index()
+            .astype({'pitchername':'str', 'pitchtype':'str'})
+           )
+
+
+def season_stats(pitchtype_totals, min_pitches=0):
+    """Season and per-pitchtype PLV/PLA from a rollup, dropping pitch types under ``min_pitches``."""
+    season_df = pitchtype_totals.loc[pitchtype_totals['num_pitches'] >= min_pitches].reset_index(drop=True)
+
+    # Clean IP to actual fractions
+    season_df['season_IP'] = season_df['subset_ip'].groupby(season_df['pitcher_mlb_id']).transform('sum')
+    season_df['season_pitches'] = season_df['num_pitches'].groupby(season_df['pitcher_mlb_id']).transform('sum')
+
+    # Calculate PLV, in general, and per-pitchtype
+    season_df['PLV'] = season_df['total_plv'].groupby(season_df['pitcher_mlb_id']).transform('sum').div(season_df['season_pitches']).astype('float')
+    season_df['pitchtype_plv'] = season_df['total_plv'].div(season_df['num_pitches'])
+
+    # Calculate PLA, in general, and per-pitchtype
+    season_df['PLA'] = season_df['pitch_runs'].groupby(season_df['pitcher_mlb_id']).transform('sum').mul(9).div(season_df['season_IP']).astype('float')
+    season_df['pitchtype_pla'] = season_df['pitch_runs'].mul(9).div(season_df['subset_ip']) # ERA Scale
+    return season_df
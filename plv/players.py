@@ -0,0 +1,140 @@
+"""Player-sorted exports of the PLV App Data.
+
+Each season is written once per role (pitcher or hitter) as a single parquet
+file sorted by the player's MLB id, in small row groups with min/max
+statistics. A JSON sidecar maps every player to the row groups holding their
+pitches, so a single-player view reads only those groups instead of the
+season::
+
+    python -m plv.players 2023 2022
+"""
+import argparse
+import hashlib
+import json
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from plv import scan, store
+
+ROLES = {'pitcher': ('pitcher_mlb_id', 'pitchername'),
+         'hitter': ('hitter_mlb_id', 'hittername')}
+EXPORT_DIR = 'players'
+ROW_GROUP_SIZE = 8192
+
+
+def export_path(year, role, root=store.STORE_ROOT):
+    return Path(root) / EXPORT_DIR / f'{year}-{role}.parquet'
+
+
+def index_path(year, role, root=store.STORE_ROOT):
+    return export_path(year, role, root).with_suffix('.json')
+
+
+def season_version(year, root=store.STORE_ROOT):
+    """Digest of a synced season's month files, or None when it isn't in the store."""
+    if not store.has_season(year, root):
+        return None
+    months = store.read_manifest(root)['seasons'][str(year)]['months']
+    key = json.dumps({month: info['sha256'] for month, info in months.items()}, sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def export_season(year, role, root=store.STORE_ROOT, row_group_size=ROW_GROUP_SIZE):
+    """Write the player-sorted file and sidecar index for one season and role."""
+    id_col, name_col = ROLES[role]
+    df = (scan.scan_season(year, columns=scan.APP_COLUMNS, root=root)
+          .sort_values([id_col, 'pitch_id'], ignore_index=True))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    path = export_path(year, role, root)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    pq.write_table(table, tmp, row_group_size=row_group_size, write_statistics=True)
+    tmp.replace(path)
+
+    ids = df[id_col].to_numpy()
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]) if len(ids) else np.array([], dtype='int')
+    stops = np.r_[starts[1:], len(ids)]
+    players = {str(ids[start]): {'name': df[name_col].iat[start],
+                                 'rows': int(stop - start),
+                                 'row_groups': list(range(start // row_group_size,
+                                                          (stop - 1) // row_group_size + 1))}
+               for start, stop in zip(starts, stops)}
+    index = {'year': year,
+             'role': role,
+             'season': season_version(year, root),
+             'row_group_size': row_group_size,
+             'players': players}
+    sidecar = index_path(year, role, root)
+    tmp = sidecar.with_suffix('.tmp')
+    tmp.write_text(json.dumps(index))
+    tmp.replace(sidecar)
+    return index
+
+
+def read_index(year, role, root=store.STORE_ROOT):
+    """The sidecar index for an export, or None when it's missing or older than the season data."""
+    path = index_path(year, role, root)
+    if not path.exists() or not export_path(year, role, root).exists():
+        return None
+    index = json.loads(path.read_text())
+    if index['season'] != season_version(year, root):
+        return None
+    return index
+
+
+def list_players(year, role, root=store.STORE_ROOT):
+    """Players in a season with their pitch counts, from the export's index when there is one."""
+    id_col, name_col = ROLES[role]
+    index = read_index(year, role, root)
+    if index is None:
+        df = scan.scan_season(year, [id_col, name_col], root=root)
+        return (df.groupby([id_col, name_col], as_index=False, observed=True).size()
+                .rename(columns={'size': 'pitches'}))
+    return pd.DataFrame([(int(player_id), entry['name'], entry['rows'])
+                         for player_id, entry in index['players'].items()],
+                        columns=[id_col, name_col, 'pitches'])
+
+
+def read_player(year, role, player_id, columns=None, root=store.STORE_ROOT):
+    """One player's pitches for a season, reading only their row groups when exported."""
+    id_col, _ = ROLES[role]
+    columns = list(columns or scan.APP_COLUMNS)
+    index = read_index(year, role, root)
+    if index is None:
+        return scan.scan_season(year, columns, filters=[(id_col, '==', player_id)], root=root)
+
+    entry = index['players'].get(str(player_id))
+    if entry is None:
+        return pd.DataFrame(columns=columns)
+    table = (pq.ParquetFile(export_path(year, role, root))
+             .read_row_groups(entry['row_groups'], columns=list(dict.fromkeys(columns + [id_col]))))
+    table = table.filter(pc.equal(table[id_col], player_id))
+    return table.to_pandas()[columns]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m plv.players',
+                                     description='Write player-sorted exports of synced seasons.')
+    parser.add_argument('years', nargs='+', type=int)
+    parser.add_argument('--role', choices=list(ROLES), action='append',
+                        help='Export only this role (default: both)')
+    parser.add_argument('--root', default=store.STORE_ROOT)
+    parser.add_argument('--row-group-size', type=int, default=ROW_GROUP_SIZE)
+    args = parser.parse_args(argv)
+
+    for year in args.years:
+        for role in args.role or list(ROLES):
+            index = export_season(year, role, root=args.root, row_group_size=args.row_group_size)
+            groups = max((max(entry['row_groups']) for entry in index['players'].values()), default=-1) + 1
+            print(f'{year} {role}s: {len(index["players"]):,} players in {groups} row groups')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Per-player running totals by game date."""
+import numpy as np
+import pandas as pd
+
+
+class DatePrefix:
+    """Cumulative pitch counts, measure sums and measure counts for each player,
+    in game date order.
+
+    Rows are one per player and game date, sorted by a packed (player, day) key,
+    with a running total over all of them. Any player's totals between two
+    dates are then the difference of the two prefix rows found by binary
+    search, so a date range never goes back to the pitch-level rows.
+    """
+
+    def __init__(self, df, key, date_column, measures):
+        self.key = key
+        self.measures = list(measures)
+        codes, players = pd.factorize(df[key], sort=True)
+        dates = df[date_column].to_numpy(dtype='datetime64[D]')
+        valid = (codes >= 0) & ~np.isnat(dates)
+        days = dates.astype('int64')
+        self.players = pd.Index(players, name=key)
+        self.first_day = int(days[valid].min()) if valid.any() else 0
+        self.span = int(days[valid].max()) - self.first_day + 1 if valid.any() else 1
+
+        packed = codes[valid].astype('int64') * self.span + (days[valid] - self.first_day)
+        self.cells, inverse = np.unique(packed, return_inverse=True)
+        self.columns = ['n'] + self.measures + [f'{measure}_n' for measure in self.measures]
+        sums = np.empty((len(self.cells), len(self.columns)))
+        sums[:, 0] = np.bincount(inverse, minlength=len(self.cells))
+        for i, measure in enumerate(self.measures):
+            values = df[measure].to_numpy(dtype='float64')[valid]
+            present = ~np.isnan(values)
+            sums[:, 1 + i] = np.bincount(inverse, weights=np.where(present, values, 0), minlength=len(self.cells))
+            sums[:, 1 + len(self.measures) + i] = np.bincount(inverse, weights=present, minlength=len(self.cells))
+        self.prefix = np.vstack([np.zeros((1, len(self.columns))), sums.cumsum(axis=0)])
+
+    @property
+    def dates(self):
+        """First and last game date covered."""
+        return (pd.Timestamp(np.datetime64(self.first_day, 'D')),
+                pd.Timestamp(np.datetime64(self.first_day + self.span - 1, 'D')))
+
+    def totals(self, start=None, end=None):
+        """Pitch counts, measure sums and measure counts per player between ``start`` and ``end``, inclusive."""
+        first = 0 if start is None else np.clip(self._day(start) - self.first_day, 0, self.span)
+        last = self.span - 1 if end is None else np.clip(self._day(end) - self.first_day, -1, self.span - 1)
+        base = np.arange(len(self.players), dtype='int64') * self.span
+        lo = np.searchsorted(self.cells, base + first, side='left')
+        hi = np.maximum(np.searchsorted(self.cells, base + last, side='right'), lo)
+        return pd.DataFrame(self.prefix[hi] - self.prefix[lo], index=self.players, columns=self.columns)
+
+    def stats(self, start=None, end=None):
+        """Pitch count ``n`` and the mean of each measure per player between ``start`` and ``end``."""
+        totals = self.totals(start, end)
+        out = pd.DataFrame({'n': totals['n'].round().astype('int64')}, index=totals.index)
+        for measure in self.measures:
+            n = totals[f'{measure}_n']
+            out[measure] = totals[measure].div(n.where(n > 0))
+        return out
+
+    @staticmethod
+    def _day(date):
+        return int(np.datetime64(pd.Timestamp(date).date(), 'D').astype('int64'))
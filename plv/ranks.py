@@ -0,0 +1,65 @@
+"""Sorted lookup tables for league-relative percentiles, quantiles and densities."""
+import numpy as np
+
+from scipy import stats
+
+
+class PercentileTable:
+    """Sorted, NaN-free values of one league distribution.
+
+    ``percentile`` matches ``scipy.stats.percentileofscore`` and ``quantile``
+    matches pandas' linear interpolation, but both are binary searches or index
+    lookups on the sorted array instead of a pass over the data.
+    """
+
+    def __init__(self, values):
+        values = np.asarray(values, dtype='float64')
+        self.values = np.sort(values[~np.isnan(values)])
+
+    def __len__(self):
+        return len(self.values)
+
+    def percentile(self, score, kind='rank'):
+        """Percentile (0-100) of ``score``; ``kind='rank'`` equals ``rank(pct=True)*100`` for values in the table."""
+        n = len(self.values)
+        if n == 0 or np.isnan(score):
+            return np.nan
+        left = np.searchsorted(self.values, score, side='left')
+        right = np.searchsorted(self.values, score, side='right')
+        if kind == 'rank':
+            return (left + right + (right > left)) * 50 / n
+        if kind == 'weak':
+            return right * 100 / n
+        if kind == 'strict':
+            return left * 100 / n
+        if kind == 'mean':
+            return (left + right) * 50 / n
+        raise ValueError(f'unknown kind {kind!r}')
+
+    def quantile(self, q):
+        """Value at quantile ``q`` (a float or a list of them)."""
+        n = len(self.values)
+        q = np.asarray(q, dtype='float64')
+        if n == 0:
+            return np.full(q.shape, np.nan) if q.ndim else np.nan
+        pos = q * (n - 1)
+        lo = np.floor(pos).astype('int')
+        hi = np.minimum(lo + 1, n - 1)
+        out = self.values[lo] + (self.values[hi] - self.values[lo]) * (pos - lo)
+        return out if q.ndim else float(out)
+
+
+def kde_curve(values, gridsize=200):
+    """Gaussian KDE of ``values`` between their min and max, as ``sns.kdeplot(cut=0)`` draws it."""
+    values = np.asarray(values, dtype='float64')
+    values = values[np.isfinite(values)]
+    if len(values) < 2 or values.min() == values.max():
+        return np.array([]), np.array([])
+    x = np.linspace(values.min(), values.max(), gridsize)
+    return x, stats.gaussian_kde(values, bw_method='scott')(x)
+
+
+def tables(df, column, by):
+    """One PercentileTable of ``column`` per value of ``by``."""
+    return {key: PercentileTable(group[column])
+            for key, group in df.groupby(by, observed=True)}
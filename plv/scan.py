@@ -0,0 +1,69 @@
+"""Column-projected, filtered reads of the PLV App Data.
+
+Filters use pyarrow's ``(column, op, value)`` tuples, e.g.
+``[('pitchtype', 'not in', ['KN','SC','UN']), ('p_hand', '==', 'R')]``. For
+synced seasons they are pushed down to the parquet row groups, so only the
+requested columns of the matching rows are ever decoded; filters on the
+``year`` and ``month`` partition fields skip whole files.
+"""
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from plv import fetch, store
+
+NON_PITCHES = ['KN','SC','UN']
+APP_COLUMNS = ['pitch_id','game_played','mlb_game_id','year_played',
+               'pitchername','pitcher_mlb_id','p_hand','pitch_extension',
+               'hittername','hitter_mlb_id','b_hand','pitchtype','pitch_type_bucket',
+               'p_x','p_z','sz_z','strike_zone_top','strike_zone_bottom','IVB','IHB','adj_vaa',
+               'balls','strikes','velo','PLV','swinging_strike_pred',
+               'called_strike_pred','in_play_input','ball_pred',
+               'home_run_pred','cleaned_description','swing_agg','strike_zone_judgement',
+               'decision_value','contact_over_expected','adj_power','batter_wOBA']
+PARTITIONING = ds.partitioning(pa.schema([('year', pa.int16()), ('month', pa.int8())]), flavor='hive')
+
+
+def _local_dataset(years, root):
+    manifest = store.read_manifest(root)['seasons']
+    parts = [(store.partition_path(year, int(month), root), info['rows'])
+             for year in years
+             for month, info in manifest[str(year)]['months'].items()
+             if info['rows'] > 0]
+    if not parts:
+        return None
+    # Empty months carry all-null columns typed as strings, so take the schema
+    # from the largest partition
+    schema = pq.read_schema(max(parts, key=lambda part: part[1])[0])
+    for field in PARTITIONING.schema:
+        schema = schema.append(field)
+    return ds.dataset([str(path) for path, _ in parts],
+                      schema=schema,
+                      format='parquet',
+                      partitioning=PARTITIONING,
+                      partition_base_dir=str(root))
+
+
+def scan_season(years, columns, filters=None, root=store.STORE_ROOT):
+    """Rows matching ``filters`` for one season (or a list of seasons), limited to ``columns``."""
+    years = [years] if isinstance(years, int) else list(years)
+    local = [year for year in years if store.has_season(year, root)]
+    remote = [year for year in years if year not in local]
+
+    frames = []
+    dataset = _local_dataset(local, root) if local else None
+    if dataset is not None:
+        frames.append(dataset
+                      .to_table(columns=[col for col in columns if col in dataset.schema.names],
+                                filter=pq.filters_to_expression(filters) if filters else None)
+                      .to_pandas())
+    if remote:
+        frames.append(fetch.read_chunks([store.remote_url(year, month)
+                                         for year in remote
+                                         for month in store.MONTHS],
+                                        columns=columns,
+                                        filters=filters))
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)[columns]
@@ -0,0 +1,17 @@
+"""Season frames shared by every Streamlit session in a process.
+
+Loaders cached with ``st.cache_resource`` return the same frame to every
+session instead of unpickling a fresh copy per call. Sessions work on
+``view(df)``, a shallow copy: with copy-on-write, adding or editing a column
+in a view copies only that column and never touches the shared frame.
+"""
+import pandas as pd
+
+# Always on from pandas 3.0; opt in on 2.x
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+
+def view(df):
+    """Read-only view of a shared frame, safe for a session to modify."""
+    return df.copy(deep=False)
@@ -0,0 +1,183 @@
+"""Gaussian kernel regression and densities on regular location grids.
+
+Observations are binned to the grid nodes first (``zone.Grid.accumulate``),
+so every kernel sum is a pass over per-node counts and sums (one-dimensional
+passes along each axis, or an FFT convolution) instead of a pass over the
+observations for every node.
+"""
+import numpy as np
+
+from scipy import signal
+
+
+def kde_grid(grid, counts):
+    """Gaussian KDE at every node of ``grid`` from per-node ``counts``.
+
+    Matches ``scipy.stats.gaussian_kde`` (Scott's rule, full covariance) fitted
+    on the observations behind ``counts`` when they sit on the nodes, as
+    snapped locations do. The kernel is laid out once over every node offset
+    and convolved with the counts by FFT. Too few or collinear observations
+    give NaN.
+    """
+    step_x, step_z = grid.step
+    n_z, n_x = grid.shape
+    n = counts.sum()
+    if n < 2:
+        return np.full(grid.shape, np.nan)
+    x = np.broadcast_to(grid.x, grid.shape)
+    z = np.broadcast_to(grid.z[:, None], grid.shape)
+    mean_x, mean_z = (counts * x).sum() / n, (counts * z).sum() / n
+    dx, dz = x - mean_x, z - mean_z
+    cov = np.array([[(counts * dx * dx).sum(), (counts * dx * dz).sum()],
+                    [(counts * dx * dz).sum(), (counts * dz * dz).sum()]]) / (n - 1)
+    cov *= n ** (-2 / 6)  # Scott's factor, n ** (-1 / (d + 4)), squared
+    det = np.linalg.det(cov)
+    if not det > 0:
+        return np.full(grid.shape, np.nan)
+    inv = np.linalg.inv(cov)
+
+    off_x = np.arange(-(n_x - 1), n_x) * step_x
+    off_z = np.arange(-(n_z - 1), n_z)[:, None] * step_z
+    kernel = (np.exp(-0.5 * (inv[0, 0] * off_x ** 2 + 2 * inv[0, 1] * off_x * off_z + inv[1, 1] * off_z ** 2))
+              / (2 * np.pi * np.sqrt(det)))
+    return signal.fftconvolve(counts, kernel, mode='same') / n
+
+
+def fill_empty(counts, sums, value):
+    """One pseudo-observation of ``value`` at every node without observations."""
+    empty = counts == 0
+    return np.where(empty, 1, counts), np.where(empty, value, sums)
+
+
+def stat_grids(grid, x, z, values, bandwidth, fill=None, reg_type='ll'):
+    """Smoothed ``(stat, z, x)`` grids for every column of ``values``.
+
+    Locations are binned once and the kernel passes are shared, so several
+    stats cost about one smoothing. ``bandwidth`` is one value for every stat
+    or one per stat (as from ``cv_bandwidth``). ``fill`` (one value per stat)
+    is used as a pseudo-observation at nodes where a stat has no observations.
+    """
+    counts, sums, _ = _binned_stats(grid, x, z, values, fill)
+    bandwidth = np.broadcast_to(bandwidth, len(counts))
+    out = np.empty(counts.shape)
+    for width in np.unique(bandwidth):
+        stats = bandwidth == width
+        out[stats] = grid_smooth(counts[stats], sums[stats], width, step=grid.step, reg_type=reg_type)
+    return out
+
+
+def cv_bandwidth(grid, x, z, values, bandwidths, fill=None, reg_type='ll'):
+    """Bandwidth from ``bandwidths`` with the lowest leave-one-out error, for every column of ``values``.
+
+    Fitted like ``stat_grids``, so ``fill`` pseudo-observations stay in every
+    fit but aren't scored.
+    """
+    fit_counts, fit_sums, obs = _binned_stats(grid, x, z, values, fill)
+    scores = cv_scores(fit_counts, fit_sums, obs, bandwidths, step=grid.step, reg_type=reg_type)
+    return np.asarray(bandwidths)[np.argmin(scores, axis=0)]
+
+
+def cv_scores(counts, sums, obs, bandwidths, step=1, reg_type='ll'):
+    """Leave-one-out mean squared error of the fit at each of ``bandwidths``.
+
+    ``counts`` and ``sums`` are the binned fitting set and ``obs`` the
+    ``(counts, sums, sums_sq)`` of the observations to score. Leaving one
+    observation out of its own node changes the fit there by a closed form
+    in its value, so each bandwidth costs one smoothing rather than one per
+    observation. Returns one row per bandwidth (and a column per stat for
+    stacked grids); bandwidths whose fit breaks down score ``inf``.
+    """
+    n, total, total_sq = obs
+    scores = []
+    for bandwidth in bandwidths:
+        fit, own = _local_fit(counts, sums, _kernels(counts.shape, step, bandwidth, reg_type), reg_type, leave_out=True)
+        # Without y at its node the fit is fit - own * y, so the residual is y * (1 + own) - fit
+        with np.errstate(invalid='ignore'):
+            error = np.where(n > 0, (1 + own) ** 2 * total_sq - 2 * fit * (1 + own) * total + n * fit ** 2, 0)
+        score = error.sum(axis=(-2, -1)) / n.sum(axis=(-2, -1))
+        scores += [np.where(np.isfinite(score), score, np.inf)]
+    return np.array(scores)
+
+
+def _binned_stats(grid, x, z, values, fill=None):
+    """Fitting counts and sums (with ``fill`` at empty nodes) plus the observed counts, sums and sums of squares."""
+    values = np.asarray(values, dtype='float64').reshape(len(values), -1)
+    obs = grid.accumulate(*grid.indices(x, z), values)
+    counts, sums = obs[0], obs[1]
+    if fill is not None:
+        counts, sums = fill_empty(counts, sums, np.reshape(np.asarray(fill, dtype='float64'), (-1, 1, 1)))
+    return counts, sums, obs
+
+
+def _kernel_passes(n, step, bandwidth, degree):
+    """Gaussian weights between every pair of nodes on one axis, times (offset ** power) for each power up to ``degree``."""
+    offsets = (np.arange(n)[None, :] - np.arange(n)[:, None]) * step
+    weights = np.exp(-0.5 * (offsets / bandwidth) ** 2)
+    return [weights * offsets ** power for power in range(degree + 1)]
+
+
+def _kernels(shape, step, bandwidth, reg_type):
+    if reg_type not in ('ll', 'lc'):
+        raise ValueError(f'unknown reg_type {reg_type!r}')
+    bw_x, bw_z = np.broadcast_to(bandwidth, 2)
+    step_x, step_z = np.broadcast_to(step, 2)
+    n_z, n_x = shape[-2:]
+    degree = 0 if reg_type == 'lc' else 2
+    return _kernel_passes(n_x, step_x, bw_x, degree), _kernel_passes(n_z, step_z, bw_z, degree)
+
+
+def _local_fit(counts, sums, kernels, reg_type, leave_out=False):
+    """Fitted value at every node.
+
+    With ``leave_out`` the fit drops one of the node's own observations: it
+    returns ``(fit, own)`` where the fit without an observation ``y`` at the
+    node is ``fit - own * y`` (the kernel weight at zero offset is 1).
+    """
+    kx, kz = kernels
+
+    def moment(grid, z_power, x_power):
+        return kz[z_power] @ grid @ kx[x_power].T
+
+    s0, t0 = moment(counts, 0, 0), moment(sums, 0, 0)
+    if leave_out:
+        s0 = s0 - 1
+    if reg_type == 'lc':
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (t0 / s0, 1 / s0) if leave_out else t0 / s0
+
+    # Local linear: solve [S0 Sx Sz; Sx Sxx Sxz; Sz Sxz Szz] b = [T0 Tx Tz] at every node.
+    # The intercept only needs the first row of the inverse, i.e. the cofactors.
+    sx, sz = moment(counts, 0, 1), moment(counts, 1, 0)
+    sxx, szz, sxz = moment(counts, 0, 2), moment(counts, 2, 0), moment(counts, 1, 1)
+    tx, tz = moment(sums, 0, 1), moment(sums, 1, 0)
+    c0 = sxx * szz - sxz ** 2
+    cx = sxz * sz - sx * szz
+    cz = sx * sxz - sxx * sz
+    det = s0 * c0 + sx * cx + sz * cz
+    singular = ~(np.abs(det) > 1e-10 * np.abs(s0 * sxx * szz))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fit = (c0 * t0 + cx * tx + cz * tz) / det
+        if leave_out:
+            return np.where(singular, np.nan, fit), np.where(singular, np.nan, c0 / det)
+    if singular.any():
+        # Nodes whose weight sits on a line or a point: least squares, as KernelReg's pinv
+        lhs = np.stack([np.stack([s0, sx, sz], -1),
+                        np.stack([sx, sxx, sxz], -1),
+                        np.stack([sz, sxz, szz], -1)], -2)[singular]
+        rhs = np.stack([t0, tx, tz], -1)[singular]
+        fit[singular] = np.einsum('...j,...j->...', np.linalg.pinv(lhs)[..., 0, :], rhs)
+    return fit
+
+
+def grid_smooth(counts, sums, bandwidth, step=1, reg_type='ll'):
+    """Kernel regression estimate at every node of a ``(z, x)`` grid.
+
+    ``counts`` and ``sums`` hold the binned observations, and may be stacked
+    ``(stat, z, x)`` arrays that share the kernel passes; ``bandwidth`` is in
+    the same units as the node spacing ``step``, and either may be an
+    ``(x, z)`` pair. ``reg_type`` is ``'ll'`` (local linear, the
+    ``statsmodels`` ``KernelReg`` default) or ``'lc'`` (local constant, i.e.
+    Nadaraya-Watson); both match ``KernelReg`` with a Gaussian kernel fitted on
+    the unbinned observations.
+    """
+    return _local_fit(counts, sums, _kernels(counts.shape, step, bandwidth, reg_type), reg_type)
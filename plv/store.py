@@ -0,0 +1,123 @@
+"""Local, partitioned copy of the PLV App Data.
+
+Seasons are kept on disk as ``year=YYYY/month=M/part-0.parquet`` with a
+``manifest.json`` at the root recording what has been synced. Populate it with::
+
+    python -m plv.store sync 2023 2022 2021 2020
+"""
+import argparse
+import hashlib
+import json
+import os
+
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from plv import fetch
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+REMOTE_ROOT = 'https://github.com/Blandalytics/PLV_viz/blob/main/data'
+STORE_ROOT = Path(os.environ.get('PLV_STORE', REPO_ROOT / 'data' / 'store'))
+MANIFEST_NAME = 'manifest.json'
+MONTHS = range(3, 11)
+
+
+def file_name(year, month):
+    return f'{year}_PLV_App_Data-{month}.parquet'
+
+
+def remote_url(year, month, source=REMOTE_ROOT):
+    if str(source).startswith('http'):
+        return f'{source}/{file_name(year, month)}?raw=true'
+    return str(Path(source) / file_name(year, month))
+
+
+def partition_path(year, month, root=STORE_ROOT):
+    return Path(root) / f'year={year}' / f'month={month}' / 'part-0.parquet'
+
+
+def read_manifest(root=STORE_ROOT):
+    path = Path(root) / MANIFEST_NAME
+    if not path.exists():
+        return {'seasons': {}}
+    return json.loads(path.read_text())
+
+
+def write_manifest(manifest, root=STORE_ROOT):
+    path = Path(root) / MANIFEST_NAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    tmp.replace(path)
+
+
+def has_season(year, root=STORE_ROOT):
+    season = read_manifest(root)['seasons'].get(str(year))
+    if season is None:
+        return False
+    return all(partition_path(year, month, root).exists() for month in season['months'])
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def sync_season(year, root=STORE_ROOT, source=REMOTE_ROOT, force=False):
+    """Copy a season's monthly files into the store and record them in the manifest."""
+    manifest = read_manifest(root)
+    pending = []
+    for month in MONTHS:
+        dest = partition_path(year, month, root)
+        if force or not dest.exists():
+            pending.append((remote_url(year, month, source), dest))
+    fetch.download_all(pending)
+
+    months = {}
+    for month in MONTHS:
+        dest = partition_path(year, month, root)
+        months[str(month)] = {
+            'rows': len(pd.read_parquet(dest, columns=['pitch_id'])),
+            'bytes': dest.stat().st_size,
+            'sha256': _sha256(dest),
+        }
+    manifest['seasons'][str(year)] = {
+        'source': str(source),
+        'synced_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'months': months,
+    }
+    write_manifest(manifest, root)
+    return manifest['seasons'][str(year)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m plv.store',
+                                     description='Manage the local PLV season store.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sync = sub.add_parser('sync', help='Download seasons into the store')
+    sync.add_argument('years', nargs='+', type=int)
+    sync.add_argument('--root', default=STORE_ROOT)
+    sync.add_argument('--source', default=REMOTE_ROOT,
+                      help='Base URL or local directory holding the monthly files')
+    sync.add_argument('--force', action='store_true', help='Re-download files already in the store')
+    sub.add_parser('status', help='Show synced seasons').add_argument('--root', default=STORE_ROOT)
+    args = parser.parse_args(argv)
+
+    if args.command == 'sync':
+        for year in args.years:
+            season = sync_season(year, root=args.root, source=args.source, force=args.force)
+            rows = sum(m['rows'] for m in season['months'].values())
+            print(f'{year}: {rows:,} pitches in {len(season["months"])} months')
+    else:
+        for year, season in sorted(read_manifest(args.root)['seasons'].items()):
+            rows = sum(m['rows'] for m in season['months'].values())
+            print(f'{year}: {rows:,} pitches, synced {season["synced_at"]}')
+
+
+if __name__ == '__main__':
+    main()
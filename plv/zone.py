@@ -0,0 +1,86 @@
+"""Location grids for strike-zone heatmaps, densities and baselines.
+
+A grid is a range of whole-number bins on each axis, ``scale`` bins per unit
+of the coordinates (12 for inches on coordinates in feet). Coordinates are
+rounded to their bin and clipped to the grid's edges, so every pitch with a
+location lands on a node.
+"""
+import numpy as np
+import pandas as pd
+
+
+class Grid:
+    def __init__(self, x_bins, z_bins, scale=12):
+        self.x_bins = tuple(x_bins)
+        self.z_bins = tuple(z_bins)
+        self.x_scale, self.z_scale = np.broadcast_to(scale, 2)
+        self.shape = (self.z_bins[1] - self.z_bins[0] + 1, self.x_bins[1] - self.x_bins[0] + 1)
+
+    @property
+    def x(self):
+        """Node coordinates across the grid."""
+        return np.arange(self.x_bins[0], self.x_bins[1] + 1) / self.x_scale
+
+    @property
+    def z(self):
+        """Node coordinates up the grid."""
+        return np.arange(self.z_bins[0], self.z_bins[1] + 1) / self.z_scale
+
+    @property
+    def step(self):
+        return 1 / self.x_scale, 1 / self.z_scale
+
+    def numbers(self, x, z):
+        """Whole-number bin of each coordinate, clipped to the grid (NaN stays NaN)."""
+        x = np.clip(np.round(np.asarray(x, dtype='float64') * self.x_scale), *self.x_bins)
+        z = np.clip(np.round(np.asarray(z, dtype='float64') * self.z_scale), *self.z_bins)
+        return x, z
+
+    def snap(self, x, z):
+        """Coordinates of the node each location bins to."""
+        x, z = self.numbers(x, z)
+        return x / self.x_scale, z / self.z_scale
+
+    def indices(self, x, z):
+        """Column and row of each location's node, -1 where a coordinate is missing."""
+        x, z = self.numbers(x, z)
+        missing = np.isnan(x) | np.isnan(z)
+        x_index = np.where(missing, -1, x - self.x_bins[0]).astype('int64')
+        z_index = np.where(missing, -1, z - self.z_bins[0]).astype('int64')
+        return x_index, z_index
+
+    def accumulate(self, x_index, z_index, values=None):
+        """Per-node counts, or counts, sums and sums of squares of ``values`` (missing values skipped).
+
+        ``values`` may have one column per stat, giving ``(stat, z, x)`` arrays
+        from the one set of node indices.
+        """
+        x_index = np.asarray(x_index)
+        z_index = np.asarray(z_index)
+        keep = (x_index >= 0) & (z_index >= 0)
+        cells = z_index[keep] * self.shape[1] + x_index[keep]
+        size = self.shape[0] * self.shape[1]
+        if values is None:
+            return np.bincount(cells, minlength=size).reshape(self.shape).astype('float64')
+        values = np.asarray(values, dtype='float64')[keep]
+        columns = values.reshape(len(values), -1).T
+        totals = []
+        for column in columns:
+            present = ~np.isnan(column)
+            column = np.where(present, column, 0)
+            totals += [[np.bincount(cells, weights=weights, minlength=size).reshape(self.shape)
+                        for weights in (present, column, column ** 2)]]
+        counts, sums, sums_sq = np.stack(totals, axis=1)
+        if values.ndim == 1:
+            return counts[0], sums[0], sums_sq[0]
+        return counts, sums, sums_sq
+
+    def frame(self, grid):
+        """A ``(z, x)`` array labelled with the node coordinates, for ``sns.heatmap``."""
+        return pd.DataFrame(grid, index=self.z, columns=self.x)
+
+
+# Inches, 20in either side of the middle of the plate and ground to 4.5ft
+PLATE = Grid((-20, 20), (0, 54))
+# Inches across, half-inches of strike-zone-relative height (-1.5 to 1.25 zones)
+BASELINE = Grid((-20, 20), (-36, 30), scale=(12, 24))
@@ -3,7 +3,7 @@ import numpy as np
 import pandas as pd
 import seaborn as sns
 
-from statsmodels.nonparametric.kernel_regression import KernelReg
+from plv import smooth, zone
 
 ### This is done with a generic "test_df" of X-locations, Z-locations, and a random value ("test_stat")
 # These can & should be replaced with a dataframe of observed X/Z/stat values (rounded to the nearest inch):
@@ -25,20 +25,18 @@ test_data = {
 }
 test_df = pd.DataFrame(test_data)
 
-### Generate a df with every possible X/Z location to fill missing data
+### Define every possible X/Z location
 # Adds 20" horizontally and 30 inches vertically, in each direction
-# I'm sure there's a better way to do this lol
-zone_df = pd.DataFrame(columns=['x','z'])
-for x in range(-20,21):
-    for y in range(0,61):
-        zone_df.loc[len(zone_df)] = [x,y]
-
-### Merge observed data onto the completed 2D space
-# Fill missing values with the average stat, from the *whole population*
-test_df = pd.merge(zone_df,
-                   test_df,
-                   on=['x','z'],
-                   how='left').fillna(avg_test_value)
+# Coordinates are already in inches, so one bin per unit
+grid = zone.Grid((-20,20), (0,60), scale=1)
+
+### Bin the observed data onto the completed 2D space
+# Count the observations (and total their stat values) at each X/Z location
+counts, sums, _ = grid.accumulate(*grid.indices(test_df['x'], test_df['z']),
+                                  test_df['test_stat'])
+
+# Fill missing locations with the average stat, from the *whole population*
+counts, sums = smooth.fill_empty(counts, sums, avg_test_value)
 
 ### Smooth the stat values
 # Specify the bandwidth
@@ -46,18 +44,17 @@ test_df = pd.merge(zone_df,
 # Lower = peakier, higher = smoother
 bandwidth = 2
 
-# Train a kernel regression model on the location and stat values, using the provided bandwidth
-kernel_regression = KernelReg(endog=test_df['test_stat'], 
-                              exog= [test_df['x'], test_df['z']], 
-                              bw=[bandwidth,bandwidth],
-                              var_type='cc') # States that X & Z are both continuous
+# Or let the data choose: of a range of candidate bandwidths, use the one with the
+# lowest leave-one-out cross-validation error (milliseconds, even for many candidates)
+# bandwidth = smooth.cv_bandwidth(grid, test_df['x'], test_df['z'], test_df['test_stat'],
+#                                 bandwidths=np.arange(1,6.25,0.25), fill=avg_test_value)[0]
 
-# Apply the model onto the X/Z coords
-test_df['smoothed_stat'] = kernel_regression.fit([test_df['x'], test_df['z']])[0]
+# Kernel regression (same as statsmodels' KernelReg, local linear) at every X/Z location, using the provided bandwidth
+smoothed_stat = smooth.grid_smooth(counts, sums, bandwidth)
 
 ### Generate viz
-# Pivot df to 2D, to better play with Seaborn's heatmap code 
-heatmap_df = test_df.pivot_table(columns='x',index='z',values=['smoothed_stat'], aggfunc='mean')
+# Label the 2D grid, to better play with Seaborn's heatmap code 
+heatmap_df = grid.frame(smoothed_stat)
 
 # Define the range of your color scale
 # This is how far above/below the center value you want the limits of your color scale to reach
@@ -68,7 +65,7 @@ color_scale_range = 0.025
 
 # Create Chart
 fig, ax = plt.subplots(figsize=(5,6))
-sns.heatmap(data=heatmap_df['smoothed_stat'].astype('float'),
+sns.heatmap(data=heatmap_df,
             cmap='vlag', # My preferred diverging palette, but use whatever you want
             center=avg_test_value, # Force the color scale to center on your average/median value
             vmin=avg_test_value-color_scale_range, # Lower limit of colorbar
@@ -0,0 +1,74 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from plv import derived, store
+
+
+def make_season(root, year=2023, n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    path = store.partition_path(year, 3, root)
+    path.parent.mkdir(parents=True)
+    path.touch()
+    store.write_manifest({'seasons': {str(year): {'months': {'3': {'rows': n, 'bytes': 0, 'sha256': 'a'}}}}}, root)
+    return pd.DataFrame({
+        'pitch_id': np.arange(n).astype('str'),
+        'p_hand': rng.choice(['L', 'R'], n),
+        'b_hand': rng.choice(['L', 'R'], n),
+        'pitchtype': rng.choice(['FF', 'SL', 'CH'], n),
+        'p_x': rng.normal(0, 0.8, n).astype('float32'),
+        'p_z': rng.normal(2.5, 0.8, n).astype('float32'),
+        'sz_z': rng.normal(0, 0.5, n).astype('float32'),
+        'balls': rng.integers(0, 4, n).astype('int8'),
+        'strikes': rng.integers(0, 3, n).astype('int8'),
+        'swing_agg': rng.normal(0, 0.1, n),
+        'strike_zone_judgement': rng.random(n).astype('float32'),
+        'in_play_input': rng.random(n).astype('float32'),
+        'contact_over_expected': rng.normal(0, 0.1, n).astype('float32'),
+        'decision_value': rng.normal(0, 0.02, n).astype('float32'),
+        'adj_power': rng.normal(0, 0.2, n).astype('float32'),
+        'batter_wOBA': rng.normal(0, 0.02, n).astype('float32'),
+    })
+
+
+def test_corrupt_file_is_rebuilt(tmp_path):
+    df = make_season(tmp_path)
+    expected = derived.with_derived(df, 2023, run_constant=0.12, root=tmp_path)
+    path = derived.derived_path(2023, derived.data_version(2023, tmp_path), tmp_path)
+    path.write_bytes(path.read_bytes()[:100])
+
+    pd.testing.assert_frame_equal(derived.with_derived(df, 2023, run_constant=0.12, root=tmp_path), expected)
+    # Rewritten, so the next load maps it again
+    assert derived._read(path).num_rows == len(df)
+    pd.testing.assert_frame_equal(derived.with_derived(df, 2023, run_constant=0.12, root=tmp_path), expected)
+
+
+def test_concurrent_writes(tmp_path):
+    df = make_season(tmp_path)
+    columns = derived.compute(df)
+    path = derived.derived_path(2023, derived.data_version(2023, tmp_path), tmp_path)
+    stale = derived.derived_path(2023, 'stale', tmp_path)
+    stale.parent.mkdir(parents=True)
+    stale.touch()
+
+    start = threading.Barrier(4)
+    errors = []
+
+    def write():
+        start.wait()
+        try:
+            for _ in range(20):
+                derived._write(path, df['pitch_id'], columns)
+        except Exception as err:
+            errors.append(err)
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(p.name for p in path.parent.iterdir()) == [path.name]
+    assert derived._read(path).num_rows == len(df)
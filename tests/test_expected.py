@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from plv import expected
+
+
+def frame(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'hand': rng.choice(['L', 'R'], n),
+        'pitch': rng.choice(['FF', 'SL', 'CH', None], n, p=[0.4, 0.3, 0.25, 0.05]),
+        'x_bin': rng.integers(-3, 4, n).astype('float'),
+        'balls': rng.integers(0, 4, n),
+        'value': rng.normal(0, 1, n),
+        'other': rng.normal(5, 1, n),
+    })
+    df.loc[rng.random(n) < 0.05, 'x_bin'] = np.nan
+    df.loc[rng.random(n) < 0.1, 'value'] = np.nan
+    return df
+
+
+KEYS = ['hand', 'pitch', 'x_bin', 'balls']
+
+
+def table(df):
+    return expected.ExpectedValueTable({key: df[key] for key in KEYS},
+                                       {'value': df['value'], 'other': df['other']})
+
+
+def test_lookup_matches_groupby():
+    df = frame()
+    values = table(df)
+    for name in ['value', 'other']:
+        brute = df.groupby(KEYS, dropna=True)[name].transform('mean')
+        np.testing.assert_allclose(values.lookup(name), brute.to_numpy(), rtol=1e-12, equal_nan=True)
+
+
+def test_lookup_new_keys():
+    df = frame()
+    values = table(df)
+    new = frame(n=200, seed=1)
+    new.loc[:9, 'pitch'] = 'KN'  # not in the table
+    new.loc[10:19, 'balls'] = 7  # outside the table's range
+    means = df.groupby(KEYS)['value'].mean()
+    brute = new.join(means.rename('mean'), on=KEYS)['mean']
+    np.testing.assert_allclose(values.lookup('value', [new[key] for key in KEYS]), brute.to_numpy(),
+                               rtol=1e-12, equal_nan=True)
+    assert (values.pack([new[key] for key in KEYS])[:20] == -1).all()
+
+
+def test_to_frame_matches_groupby():
+    df = frame()
+    result = table(df).to_frame()
+    brute = df.groupby(KEYS).agg(n=('other', 'size'), value=('value', 'mean'), other=('other', 'mean'))
+    assert len(result) == len(brute)
+    result = result.loc[brute.index]
+    assert (result['n'].to_numpy() == brute['n'].to_numpy()).all()
+    np.testing.assert_allclose(result[['value', 'other']].to_numpy(), brute[['value', 'other']].to_numpy(),
+                               rtol=1e-12, equal_nan=True)
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from plv import prefix
+
+
+def frame(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'player': rng.choice(['a', 'b', 'c', None], n, p=[0.4, 0.3, 0.25, 0.05]),
+        'date': pd.Timestamp('2023-04-01') + pd.to_timedelta(rng.integers(0, 60, n), unit='D'),
+        'value': rng.normal(0, 1, n),
+        'runs': rng.normal(0, 0.1, n),
+    })
+    df.loc[rng.random(n) < 0.03, 'date'] = pd.NaT
+    df.loc[rng.random(n) < 0.1, 'value'] = np.nan
+    return df
+
+
+def brute(df, start, end):
+    dates = df['date']
+    rows = df.loc[df['player'].notna() & dates.notna()
+                  & (start is None or dates >= pd.Timestamp(start))
+                  & (end is None or dates <= pd.Timestamp(end))]
+    players = sorted(df['player'].dropna().unique())
+    grouped = rows.groupby('player')
+    return pd.DataFrame({'n': grouped.size(),
+                         'value': grouped['value'].mean(),
+                         'runs': grouped['runs'].mean()}).reindex(players)
+
+
+@pytest.mark.parametrize('start,end', [
+    (None, None),
+    ('2023-04-10', '2023-04-20'),
+    ('2023-04-15', '2023-04-15'),
+    ('2023-01-01', '2023-12-31'),  # wider than the season
+    ('2022-01-01', '2022-12-31'),  # before the season
+    ('2024-01-01', None),  # after the season
+    ('2023-04-20', '2023-04-10'),  # inverted
+])
+def test_stats_match_groupby(start, end):
+    df = frame()
+    result = prefix.DatePrefix(df, 'player', 'date', ['value', 'runs']).stats(start, end)
+    expected = brute(df, start, end)
+    assert list(result.index) == list(expected.index)
+    assert (result['n'].to_numpy() == expected['n'].fillna(0).to_numpy()).all()
+    np.testing.assert_allclose(result[['value', 'runs']].to_numpy(), expected[['value', 'runs']].to_numpy(),
+                               rtol=1e-9, atol=1e-12, equal_nan=True)
+
+
+def test_dates():
+    df = frame()
+    assert prefix.DatePrefix(df, 'player', 'date', ['value']).dates == (df['date'].min(), df['date'].max())
@@ -0,0 +1,33 @@
+import pandas as pd
+
+from plv import scan, store
+
+
+def make_store(root, year=2023, months=(3, 4), rows=20):
+    season = {}
+    for month in months:
+        path = store.partition_path(year, month, root)
+        path.parent.mkdir(parents=True)
+        pd.DataFrame({'pitch_id': [f'{month}-{i}' for i in range(rows)],
+                      'p_hand': ['R', 'L'] * (rows // 2)}).to_parquet(path)
+        season[str(month)] = {'rows': rows, 'bytes': path.stat().st_size, 'sha256': ''}
+    store.write_manifest({'seasons': {str(year): {'months': season}}}, root)
+
+
+def test_filter_on_partition_fields(tmp_path):
+    make_store(tmp_path)
+    assert len(scan.scan_season(2023, ['pitch_id'], root=tmp_path)) == 40
+    assert len(scan.scan_season(2023, ['pitch_id'], filters=[('year', '==', 2023)], root=tmp_path)) == 40
+    assert scan.scan_season(2023, ['pitch_id'], filters=[('year', '==', 2022)], root=tmp_path).empty
+
+    march = scan.scan_season(2023, ['pitch_id', 'month'], filters=[('month', '==', 3)], root=tmp_path)
+    assert march['pitch_id'].str.startswith('3-').all()
+    assert (march['month'] == 3).all()
+
+
+def test_filter_pushdown_on_columns(tmp_path):
+    make_store(tmp_path)
+    df = scan.scan_season(2023, ['pitch_id', 'p_hand'], filters=[('p_hand', '==', 'L'), ('month', '==', 4)],
+                          root=tmp_path)
+    assert len(df) == 10
+    assert list(df.columns) == ['pitch_id', 'p_hand']
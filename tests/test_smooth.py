@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from plv import smooth, zone
+
+GRID = zone.Grid((-8, 8), (0, 12), scale=4)
+
+
+def observations(n=80, seed=0):
+    rng = np.random.default_rng(seed)
+    x, z = GRID.snap(rng.normal(0, 0.8, n), rng.normal(1.5, 0.6, n))
+    y = np.sin(2 * x) + z ** 2 / 4 + rng.normal(0, 0.2, n)
+    return x, z, y
+
+
+@pytest.mark.parametrize('reg_type', ['ll', 'lc'])
+def test_grid_smooth_matches_kernelreg(reg_type):
+    nonparametric = pytest.importorskip('statsmodels.nonparametric.api')
+    x, z, y = observations()
+    bandwidth = 0.4
+    counts, sums, _ = GRID.accumulate(*GRID.indices(x, z), y)
+    fit = smooth.grid_smooth(counts, sums, bandwidth, step=GRID.step, reg_type=reg_type)
+
+    nodes_x, nodes_z = np.meshgrid(GRID.x, GRID.z)
+    model = nonparametric.KernelReg(y, np.column_stack([x, z]), var_type='cc',
+                                    reg_type=reg_type, bw=[bandwidth, bandwidth])
+    expected = model.fit(np.column_stack([nodes_x.ravel(), nodes_z.ravel()]))[0].reshape(GRID.shape)
+    np.testing.assert_allclose(fit, expected, rtol=0, atol=1e-12)
+
+
+def test_kde_grid_matches_gaussian_kde():
+    stats = pytest.importorskip('scipy.stats')
+    x, z, _ = observations()
+    counts = GRID.accumulate(*GRID.indices(x, z))
+    nodes_x, nodes_z = np.meshgrid(GRID.x, GRID.z)
+    expected = stats.gaussian_kde(np.vstack([x, z]))(np.vstack([nodes_x.ravel(), nodes_z.ravel()]))
+    np.testing.assert_allclose(smooth.kde_grid(GRID, counts), expected.reshape(GRID.shape), rtol=0, atol=1e-12)
+
+
+def test_kde_grid_degenerate():
+    counts = np.zeros(GRID.shape)
+    counts[3, 4] = 5
+    assert np.isnan(smooth.kde_grid(GRID, counts)).all()
+
+
+@pytest.mark.parametrize('reg_type', ['ll', 'lc'])
+@pytest.mark.parametrize('fill', [None, 0.5])
+def test_cv_scores_match_brute_force(reg_type, fill):
+    x, z, y = observations(n=40)
+    bandwidths = [0.3, 0.5, 0.8]
+    x_index, z_index = GRID.indices(x, z)
+    obs = GRID.accumulate(x_index, z_index, y)
+    counts, sums = obs[0], obs[1]
+    if fill is not None:
+        counts, sums = smooth.fill_empty(counts, sums, fill)
+
+    expected = []
+    for bandwidth in bandwidths:
+        errors = []
+        for i in range(len(y)):
+            node = z_index[i], x_index[i]
+            loo_counts, loo_sums = counts.copy(), sums.copy()
+            loo_counts[node] -= 1
+            loo_sums[node] -= y[i]
+            fit = smooth.grid_smooth(loo_counts, loo_sums, bandwidth, step=GRID.step, reg_type=reg_type)
+            errors += [(y[i] - fit[node]) ** 2]
+        expected += [np.mean(errors)]
+
+    scores = smooth.cv_scores(counts, sums, obs, bandwidths, step=GRID.step, reg_type=reg_type)
+    np.testing.assert_allclose(scores, expected, rtol=1e-9)
+
+
+def test_cv_bandwidth_per_stat():
+    x, z, y = observations()
+    values = np.column_stack([y, np.random.default_rng(1).normal(0, 1, len(y))])
+    bandwidths = np.linspace(0.2, 1.6, 8)
+    chosen = smooth.cv_bandwidth(GRID, x, z, values, bandwidths, fill=[0, 0])
+    assert chosen.shape == (2,)
+    # Pure noise is best smoothed flat, the signal less so
+    assert chosen[1] == bandwidths[-1]
+    assert chosen[0] < chosen[1]
+
+    grids = smooth.stat_grids(GRID, x, z, values, chosen, fill=[0, 0])
+    for stat in range(2):
+        alone = smooth.stat_grids(GRID, x, z, values[:, stat], chosen[stat], fill=0)
+        np.testing.assert_allclose(grids[stat], alone[0], rtol=0, atol=1e-12)